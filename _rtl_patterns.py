@@ -0,0 +1,81 @@
+# -*- coding: utf-8 -*-
+"""
+RTL验证脚本共用的正则表达式与源文件读取
+========================================
+
+verify_rtl.py 与 windows_verification.py 共用本模块，模式在导入时只编译一次。
+所有模式均按字节匹配，调用方通过 open_source 以二进制方式读取源文件。
+"""
+
+import mmap
+import os
+import re
+from contextlib import contextmanager
+
+# 超过该大小的源文件改用mmap映射，避免把整个文件拷贝成bytes
+MMAP_MIN_SIZE = 1 << 20
+
+# 对mmap分块处理（统计、校验）时每块的大小
+CHUNK_SIZE = 1 << 20
+
+# 时间尺度指令
+TIMESCALE_TOKEN = b'`timescale'
+
+# 模块声明（windows_verification只需模块名）
+MODULE_RE = re.compile(rb'module\s+(\w+)')
+
+# input/output关键字，一次扫描统计两类端口
+PORT_WORD_RE = re.compile(rb'\b(input|output)\b')
+
+# 模块解析用的合并正则。
+# 零宽前瞻使各类匹配互不吞并，配合按类别记录的上次匹配结束位置，
+# 结果与分别search/findall一致；开头的字符类让引擎快速跳过不可能匹配的位置
+MODULE_SCAN_RE = re.compile(
+    rb'(?=[miop])'
+    rb'(?=(?P<module>module\s+(\w+)\s*\()'
+    rb'|(?P<inputs>input\s+(?:\[[\d:]+\])?\s*(\w+))'
+    rb'|(?P<outputs>output\s+(?:\[[\d:]+\])?\s*(\w+))'
+    rb'|(?P<inouts>inout\s+(?:\[[\d:]+\])?\s*(\w+))'
+    rb'|(?P<parameters>parameter\s+(\w+)))',
+    re.IGNORECASE
+)
+
+def scan_module(content):
+    """单次扫描文件内容(bytes)，收集模块声明、端口和参数，标识符按ASCII解码"""
+    found = {'module': [], 'inputs': [], 'outputs': [], 'inouts': [], 'parameters': []}
+    last_end = dict.fromkeys(found, 0)
+    
+    for match in MODULE_SCAN_RE.finditer(content):
+        kind = match.lastgroup
+        begin = match.start(kind)
+        if begin < last_end[kind]:
+            continue
+        last_end[kind] = match.end(kind)
+        found[kind].append(match.group(match.lastindex + 1).decode('ascii'))
+    
+    return found
+
+@contextmanager
+def open_source(file_path):
+    """提供源文件内容：小文件返回bytes，大文件返回只读mmap（仅在with块内有效）
+    
+    mmap没有count/endswith，且`in`只按单字节比较，调用方应使用find、切片
+    和count_newlines等两者通用的操作。
+    """
+    with open(file_path, 'rb') as f:
+        if os.fstat(f.fileno()).st_size < MMAP_MIN_SIZE:
+            yield f.read()
+        else:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                yield mm
+
+def iter_chunks(content):
+    """按CHUNK_SIZE分块产出bytes，用于对mmap做不整体拷贝的逐块处理"""
+    for start in range(0, len(content), CHUNK_SIZE):
+        yield content[start:start + CHUNK_SIZE]
+
+def count_newlines(content):
+    """统计换行符数量，mmap按块统计以免整体拷贝"""
+    if isinstance(content, bytes):
+        return content.count(b'\n')
+    return sum(chunk.count(b'\n') for chunk in iter_chunks(content))
@@ -15,166 +15,363 @@ Version: 1.0
 import os
 import re
 import sys
+import json
+import time
+import hashlib
 from pathlib import Path
-from typing import List, Tuple, Dict
+from typing import List, NamedTuple, Tuple, Dict, Optional
+import mmap
 import argparse
+from bisect import bisect_left
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+
+# 预编译的正则表达式
+# 循环条件中的变量：小写开头的标识符，循环变量i/j/k本身除外
+_LOOP_VAR_RE = re.compile(r'\b(?![ijk]\b)[a-z][a-zA-Z0-9_]*\b')
+_NEWLINE_RE = re.compile(rb'\n')
+
+# 所有检查合并为一个字节正则，直接在mmap上扫描，按命中的命名分组分派：
+#   comment - 行注释（整段吞掉，注释中的内容不参与检查）
+#   shift   - 移位操作符（较长的操作符在前）
+#   sv      - SystemVerilog特性：数据类型、接口、OOP、always_ff/always_comb、case修饰符、通配符连接
+#   forloop - for循环（零宽预查，不吞掉循环头中的其他命中；不跨行、不进入注释）
+#   dual    - 双端口存储器信号名（整词匹配，不再匹配标识符内部的_a/_b）
+_WS = rb'[^\S\n]*'
+_CH = rb'(?:(?!//)[^\n])'
+_CHECK_RE = re.compile(
+    rb'(?P<comment>//[^\n]*)'
+    rb'|(?P<shift><<<|>>>|<<|>>)'
+    rb'|(?P<sv>\b(?:logic|bit|byte|interface|modport|class|package'
+    rb'|always_ff|always_comb|unique|priority)\b|\.\*)'
+    rb'|(?=(?P<forloop>(?i:for)' + _WS + rb'\(' + _WS + _CH + rb'*?;' + _WS +
+    rb'(?P<cond>' + _CH + rb'*?);' + _WS + _CH + rb'*?\)))'
+    rb'|(?P<dual>\b(?i:addr_a|addr_b|wdata_a|wdata_b|rdata_a|rdata_b)\b)'
+)
+
+# 超过该长度（字节数）的文件使用JIT编译的整文件字符串掩码
+JIT_MASK_THRESHOLD = 1 << 20
+
+def _fill_string_mask(buf, mask):
+    """计算整个缓冲区的字符串掩码，字符串状态在换行处复位"""
+    in_str = False
+    prev = 0
+    for i in range(buf.size):
+        c = buf[i]
+        if c == 10:  # '\n'
+            in_str = False
+        else:
+            if in_str:
+                mask[i] = 1
+            if c == 34 and prev != 92:  # 未转义的'"'
+                in_str = not in_str
+        prev = c
+
+@lru_cache(maxsize=None)
+def _jit_string_mask():
+    """首次遇到大文件时才导入Numba（可选依赖）并编译掩码函数，不可用时返回None"""
+    try:
+        from numba import njit
+    except ImportError:
+        return None
+    return njit(cache=True)(_fill_string_mask)
+
+def _file_string_mask(content):
+    """大文件一次性计算整文件字符串掩码，否则返回None（按行计算）"""
+    if len(content) < JIT_MASK_THRESHOLD or content.find(b'"') < 0:
+        return None
+    fill_mask = _jit_string_mask()
+    if fill_mask is None:
+        return None
+    
+    import numpy as np
+    buf = np.frombuffer(content, dtype=np.uint8)
+    mask = np.zeros(buf.size, dtype=np.uint8)
+    fill_mask(buf, mask)
+    # 释放对mmap缓冲区的引用，保证mmap可以正常关闭
+    del buf
+    return mask
+
+class RuleIssue(NamedTuple):
+    """单条检查结果，报告时才格式化为文本"""
+    filepath: str
+    line_num: int  # 0表示与具体行无关（如文件读取错误）
+    kind: str
+    token: str
+    text: str
+
+# 各类检查结果的消息模板
+_ISSUE_MESSAGES = {
+    'shift': "禁用移位操作符 '{token}' - {text}",
+    'forloop': "禁用非常数循环次数的for语句 - {text}",
+    'dual': "疑似双端口存储器使用 '{token}' - {text}",
+    'sv': "可能的SystemVerilog特性 '{token}' - {text}",
+    'read_error': "文件读取错误 - {text}",
+}
+
+def format_issue(issue: RuleIssue) -> str:
+    """把检查结果格式化为"文件:行号: 消息"形式的文本"""
+    message = _ISSUE_MESSAGES[issue.kind].format(token=issue.token, text=issue.text)
+    if issue.line_num:
+        return f"{issue.filepath}:{issue.line_num}: {message}"
+    return f"{issue.filepath}: {message}"
+
+# 检查结果缓存文件
+DEFAULT_CACHE_FILE = Path(__file__).parent / '.rtlcheck_cache.json'
+
+class RTLCheckCache:
+    """RTL检查结果缓存
+    
+    两级查找：先比较(mtime, size)，不一致时再比较文件内容哈希。
+    检查脚本本身的哈希作为缓存版本，规则修改后旧缓存自动失效。
+    """
+    
+    def __init__(self, cache_file: Path = DEFAULT_CACHE_FILE,
+                 ttl: float = 24 * 3600, max_entries: int = 2000):
+        self.cache_file = Path(cache_file)
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.version = hashlib.blake2b(Path(__file__).read_bytes(), digest_size=16).hexdigest()
+        self.entries: Dict[str, Dict] = {}
+        self._pending: Dict[str, Tuple[int, int, str]] = {}
+    
+    def load(self):
+        """加载缓存文件，丢弃版本不符或过期的条目"""
+        try:
+            with open(self.cache_file, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+        
+        if data.get('version') != self.version:
+            return
+        
+        now = time.time()
+        self.entries = {
+            path: entry for path, entry in data.get('entries', {}).items()
+            if now - entry.get('last_used', 0) < self.ttl
+        }
+    
+    def save(self):
+        """保存缓存文件，超出容量时按最近使用时间淘汰"""
+        entries = self.entries
+        if len(entries) > self.max_entries:
+            recent = sorted(entries.items(), key=lambda kv: kv[1]['last_used'], reverse=True)
+            entries = dict(recent[:self.max_entries])
+        
+        try:
+            with open(self.cache_file, 'w', encoding='utf-8') as f:
+                json.dump({'version': self.version, 'entries': entries}, f, ensure_ascii=False)
+        except OSError as e:
+            print(f"警告: 无法写入缓存文件 {self.cache_file} - {e}")
+    
+    def lookup(self, filepath: str,
+               st: Optional[os.stat_result] = None) -> Optional[Tuple[List[RuleIssue], List[RuleIssue]]]:
+        """查找缓存的检查结果，未命中时返回None（可传入已有的stat结果）"""
+        try:
+            if st is None:
+                st = os.stat(filepath)
+        except OSError:
+            return None
+        
+        entry = self.entries.get(filepath)
+        if entry and entry['mtime_ns'] == st.st_mtime_ns and entry['size'] == st.st_size:
+            entry['last_used'] = time.time()
+            return _issues_from_cache(entry)
+        
+        # 文件时间戳变化，比较内容哈希
+        try:
+            with open(filepath, 'rb') as f:
+                digest = hashlib.blake2b(f.read(), digest_size=16).hexdigest()
+        except OSError:
+            return None
+        
+        if entry and entry['hash'] == digest:
+            entry.update(mtime_ns=st.st_mtime_ns, size=st.st_size, last_used=time.time())
+            return _issues_from_cache(entry)
+        
+        self._pending[filepath] = (st.st_mtime_ns, st.st_size, digest)
+        return None
+    
+    def store(self, filepath: str, errors: List[RuleIssue], warnings: List[RuleIssue]):
+        """保存单个文件的检查结果（需先调用lookup）"""
+        key = self._pending.pop(filepath, None)
+        if key is None:
+            return
+        
+        mtime_ns, size, digest = key
+        self.entries[filepath] = {
+            'mtime_ns': mtime_ns,
+            'size': size,
+            'hash': digest,
+            'errors': errors,
+            'warnings': warnings,
+            'last_used': time.time()
+        }
+
+def _issues_from_cache(entry: Dict) -> Tuple[List[RuleIssue], List[RuleIssue]]:
+    """缓存中的检查结果以JSON数组保存，读取时还原为RuleIssue"""
+    return ([RuleIssue(*issue) for issue in entry['errors']],
+            [RuleIssue(*issue) for issue in entry['warnings']])
 
 class RTLRuleChecker:
-    def __init__(self):
+    def __init__(self, cache: Optional[RTLCheckCache] = None):
         self.errors = []
         self.warnings = []
-        self.shift_operators = ['<<', '>>', '>>>']
+        self.cache = cache
         
     def check_file(self, filepath: str) -> bool:
         """检查单个Verilog文件"""
+        cached = self.cache.lookup(filepath) if self.cache else None
+        if cached is not None:
+            errors, warnings = cached
+        else:
+            errors, warnings = _check_file_worker(filepath)
+            if self.cache:
+                self.cache.store(filepath, errors, warnings)
+        
+        self.errors.extend(errors)
+        self.warnings.extend(warnings)
+        return len(self.errors) == 0
+    
+    def _scan_file(self, filepath: str) -> bool:
+        """通过mmap读取并扫描单个Verilog文件"""
         try:
-            with open(filepath, 'r', encoding='utf-8') as f:
-                content = f.read()
-                lines = content.splitlines()
-                
-            self.check_shift_operators(filepath, lines)
-            self.check_for_loops(filepath, lines)
-            self.check_memory_ports(filepath, lines)
-            self.check_verilog_standard(filepath, lines)
+            with open(filepath, 'rb') as f:
+                # 空文件无法mmap，也无需检查
+                if os.fstat(f.fileno()).st_size > 0:
+                    with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                        self._scan_content(filepath, mm)
             
             return len(self.errors) == 0
             
         except Exception as e:
-            self.errors.append(f"{filepath}: 文件读取错误 - {str(e)}")
+            self.errors.append(RuleIssue(filepath, 0, 'read_error', '', str(e)))
             return False
     
-    def check_shift_operators(self, filepath: str, lines: List[str]):
-        """检查移位操作符使用"""
-        for line_num, line in enumerate(lines, 1):
-            # 移除注释
-            comment_pos = line.find('//')
-            if comment_pos >= 0:
-                line = line[:comment_pos]
+    def _scan_content(self, filepath: str, content):
+        """对整个文件(bytes或mmap)执行一次正则扫描，完成移位操作符、for循环、存储器端口和Verilog标准检查"""
+        # 记录换行位置用于二分查找行号
+        newlines = [m.start() for m in _NEWLINE_RE.finditer(content)]
+        file_mask = _file_string_mask(content)
+        # 仲裁器模块允许有双端口信号
+        skip_dual = 'arbiter' in filepath.lower()
+        
+        reported = set()
+        masks = {}
+        for_lines = set()
+        
+        def in_string(pos, line_num, line_start, line_end):
+            if file_mask is not None:
+                return bool(file_mask[pos])
+            if line_num not in masks:
+                masks[line_num] = self._string_mask(content[line_start:line_end])
+            return bool(masks[line_num][pos - line_start])
+        
+        for m in _CHECK_RE.finditer(content):
+            kind = m.lastgroup
+            if kind == 'comment' or (kind == 'dual' and skip_dual):
+                continue
             
-            # 检查移位操作符
-            for op in self.shift_operators:
-                if op in line:
-                    # 确认不是在字符串中
-                    if not self._in_string(line, line.find(op)):
-                        self.errors.append(
-                            f"{filepath}:{line_num}: 禁用移位操作符 '{op}' - {line.strip()}"
-                        )
-    
-    def check_for_loops(self, filepath: str, lines: List[str]):
-        """检查for循环约束"""
-        for line_num, line in enumerate(lines, 1):
-            # 移除注释
-            comment_pos = line.find('//')
-            if comment_pos >= 0:
-                line = line[:comment_pos]
+            pos = m.start()
+            line_idx = bisect_left(newlines, pos)
+            line_start = newlines[line_idx - 1] + 1 if line_idx > 0 else 0
+            line_end = newlines[line_idx] if line_idx < len(newlines) else len(content)
+            line_num = line_idx + 1
             
-            # 检查for循环
-            if 'for' in line.lower() and '(' in line:
-                # 提取for循环条件
-                for_match = re.search(r'for\s*\(\s*.*?;\s*(.*?);\s*.*?\)', line, re.IGNORECASE)
-                if for_match:
-                    condition = for_match.group(1).strip()
-                    if not self._is_constant_loop_condition(condition):
-                        self.errors.append(
-                            f"{filepath}:{line_num}: 禁用非常数循环次数的for语句 - {line.strip()}"
-                        )
-    
-    def check_memory_ports(self, filepath: str, lines: List[str]):
-        """检查存储器端口使用"""
-        dual_port_indicators = [
-            '_a', '_b',           # 端口A/B命名
-            'addr_a', 'addr_b',   # 双端口地址
-            'wdata_a', 'wdata_b', # 双端口写数据
-            'rdata_a', 'rdata_b'  # 双端口读数据
-        ]
-        
-        for line_num, line in enumerate(lines, 1):
-            # 移除注释
-            comment_pos = line.find('//')
-            if comment_pos >= 0:
-                line = line[:comment_pos]
+            if kind == 'forloop':
+                # 与逐行检查一致：每行只检查第一个不在字符串中的for循环
+                if line_num in for_lines or in_string(pos, line_num, line_start, line_end):
+                    continue
+                for_lines.add(line_num)
+                condition = m.group('cond').decode('utf-8', 'replace').strip()
+                if self._is_constant_loop_condition(condition):
+                    continue
+                token = 'for'
+            else:
+                token = m.group(kind).decode('ascii')
+                if kind == 'dual':
+                    token = token.lower()
             
-            for indicator in dual_port_indicators:
-                if indicator in line.lower():
-                    # 检查是否在仲裁器模块中（仲裁器允许有这些信号）
-                    if 'arbiter' not in filepath.lower():
-                        self.warnings.append(
-                            f"{filepath}:{line_num}: 疑似双端口存储器使用 '{indicator}' - {line.strip()}"
-                        )
-    
-    def check_verilog_standard(self, filepath: str, lines: List[str]):
-        """检查Verilog 2001标准遵循"""
-        # SystemVerilog特性检查
-        sv_features = [
-            'logic', 'bit', 'byte',      # SystemVerilog数据类型
-            'interface', 'modport',       # 接口特性
-            'class', 'package',           # OOP特性
-            'always_ff', 'always_comb',   # SystemVerilog always
-            'unique', 'priority',         # 案例语句修饰符
-            '.*',                         # 通配符连接
-        ]
-        
-        for line_num, line in enumerate(lines, 1):
-            # 移除注释和字符串
-            comment_pos = line.find('//')
-            if comment_pos >= 0:
-                line = line[:comment_pos]
+            # 同一行的同一命中只报告一次
+            key = (line_num, kind, token)
+            if key in reported:
+                continue
             
-            for feature in sv_features:
-                if feature in line:
-                    # 排除在注释或字符串中的情况
-                    if not self._in_string(line, line.find(feature)):
-                        self.warnings.append(
-                            f"{filepath}:{line_num}: 可能的SystemVerilog特性 '{feature}' - {line.strip()}"
-                        )
-    
-    def _in_string(self, line: str, pos: int) -> bool:
-        """检查位置是否在字符串内"""
-        if pos < 0:
-            return False
+            # 移位操作符和SV特性需排除在字符串中的情况
+            if kind in ('shift', 'sv') and in_string(pos, line_num, line_start, line_end):
+                continue
+            
+            reported.add(key)
+            # 仅在需要报告时才解码该行（去掉注释部分）；消息文本到打印报告时才格式化
+            line = content[line_start:line_end]
+            text = line.split(b'//', 1)[0].decode('utf-8', 'replace').strip()
+            issue = RuleIssue(filepath, line_num, kind, token, text)
+            if kind in ('shift', 'forloop'):
+                self.errors.append(issue)
+            else:
+                self.warnings.append(issue)
+    
+    def _string_mask(self, line: bytes) -> bytearray:
+        """计算字符串掩码：mask[i]为1表示第i个字节位于字符串内"""
+        mask = bytearray(len(line))
+        if b'"' not in line:
+            return mask
         
-        quote_count = 0
-        for i in range(pos):
-            if line[i] == '"' and (i == 0 or line[i-1] != '\\'):
-                quote_count += 1
+        in_str = False
+        for i, c in enumerate(line):
+            mask[i] = in_str
+            if c == 0x22 and (i == 0 or line[i-1] != 0x5C):  # 未转义的'"'
+                in_str = not in_str
         
-        return quote_count % 2 == 1
+        return mask
     
     def _is_constant_loop_condition(self, condition: str) -> bool:
-        """检查循环条件是否为常数"""
-        # 简单的常数检查
-        constant_patterns = [
-            r'\b\d+\b',                    # 纯数字
-            r'\b[A-Z_][A-Z0-9_]*\b',      # 参数或常数（大写）
-            r'\bparameter\b',              # parameter关键字
-            r'\blocalparam\b',             # localparam关键字
-        ]
-        
-        # 检查是否包含变量（小写开头的标识符）
-        variable_pattern = r'\b[a-z][a-zA-Z0-9_]*\b'
-        variables = re.findall(variable_pattern, condition)
-        
-        # 排除已知的常数关键字
-        constants = ['i', 'j', 'k']  # 循环变量本身不算
-        variables = [v for v in variables if v not in constants]
-        
-        return len(variables) == 0
-    
-    def check_directory(self, directory: str, pattern: str = "*.v") -> bool:
-        """检查目录下的所有Verilog文件"""
+        """检查循环条件是否为常数（不含除i/j/k外小写开头的变量）"""
+        # 一次search，找到第一个变量即返回，无需收集全部标识符
+        return _LOOP_VAR_RE.search(condition) is None
+    
+    def check_directory(self, directory: str, pattern: str = "*.v",
+                        jobs: Optional[int] = None) -> bool:
+        """检查目录下的所有Verilog文件（各文件相互独立，按进程并行检查）"""
         verilog_files = []
-        for root, dirs, files in os.walk(directory):
-            for file in files:
-                if file.endswith('.v') or file.endswith('.vh'):
-                    verilog_files.append(os.path.join(root, file))
         
-        success = True
-        for filepath in verilog_files:
+        # 先查缓存，只有未命中的文件需要重新检查
+        results = {}
+        stale_files = []
+        for entry in _iter_verilog_files(directory):
+            filepath = entry.path
+            verilog_files.append(filepath)
             print(f"检查文件: {filepath}")
-            if not self.check_file(filepath):
-                success = False
+            cached = None
+            if self.cache:
+                try:
+                    cached = self.cache.lookup(filepath, entry.stat())
+                except OSError:
+                    cached = None
+            if cached is not None:
+                results[filepath] = cached
+            else:
+                stale_files.append(filepath)
+        
+        if jobs == 1 or len(stale_files) <= 1:
+            fresh = map(_check_file_worker, stale_files)
+            results.update(zip(stale_files, fresh))
+        else:
+            with ProcessPoolExecutor(max_workers=jobs) as executor:
+                fresh = executor.map(_check_file_worker, stale_files, chunksize=8)
+                results.update(zip(stale_files, fresh))
+        
+        # 按文件顺序合并各文件的检查结果
+        stale_set = set(stale_files)
+        for filepath in verilog_files:
+            errors, warnings = results[filepath]
+            if self.cache and filepath in stale_set:
+                self.cache.store(filepath, errors, warnings)
+            self.errors.extend(errors)
+            self.warnings.extend(warnings)
         
-        return success
+        return len(self.errors) == 0
     
     def print_report(self):
         """打印检查报告"""
@@ -185,12 +382,12 @@ class RTLRuleChecker:
         if self.errors:
             print(f"\n❌ 发现 {len(self.errors)} 个错误:")
             for error in self.errors:
-                print(f"  {error}")
+                print(f"  {format_issue(error)}")
         
         if self.warnings:
             print(f"\n⚠️  发现 {len(self.warnings)} 个警告:")
             for warning in self.warnings:
-                print(f"  {warning}")
+                print(f"  {format_issue(warning)}")
         
         if not self.errors and not self.warnings:
             print("\n✅ 所有检查通过，代码符合RTL设计规则")
@@ -200,24 +397,64 @@ class RTLRuleChecker:
         print(f"  警告: {len(self.warnings)}")
         print("="*80)
 
+def _iter_verilog_files(directory: str):
+    """用os.scandir递归遍历目录，产生.v/.vh文件的DirEntry（先当前目录文件，后子目录）"""
+    # 与os.walk一致，跳过无法读取的目录
+    try:
+        with os.scandir(directory) as it:
+            entries = list(it)
+    except OSError:
+        return
+    
+    subdirs = []
+    for entry in entries:
+        try:
+            is_dir = entry.is_dir(follow_symlinks=False)
+        except OSError:
+            is_dir = False
+        if is_dir:
+            subdirs.append(entry.path)
+        elif entry.name.endswith(('.v', '.vh')):
+            yield entry
+    
+    for subdir in subdirs:
+        yield from _iter_verilog_files(subdir)
+
+def _check_file_worker(filepath: str) -> Tuple[List[RuleIssue], List[RuleIssue]]:
+    """进程池工作函数：检查单个文件并返回(错误列表, 警告列表)"""
+    checker = RTLRuleChecker()
+    checker._scan_file(filepath)
+    return checker.errors, checker.warnings
+
 def main():
     parser = argparse.ArgumentParser(description='RTL设计规则检查工具')
     parser.add_argument('path', help='要检查的文件或目录路径')
     parser.add_argument('--strict', action='store_true', help='严格模式，警告也视为错误')
     parser.add_argument('--exclude', nargs='*', default=[], help='排除的文件模式')
+    parser.add_argument('--jobs', '-j', type=int, default=None,
+                        help='并行检查的进程数（默认使用全部CPU核心）')
+    parser.add_argument('--no-cache', action='store_true', help='禁用检查结果缓存')
     
     args = parser.parse_args()
     
-    checker = RTLRuleChecker()
+    cache = None
+    if not args.no_cache:
+        cache = RTLCheckCache()
+        cache.load()
+    
+    checker = RTLRuleChecker(cache)
     
     if os.path.isfile(args.path):
         success = checker.check_file(args.path)
     elif os.path.isdir(args.path):
-        success = checker.check_directory(args.path)
+        success = checker.check_directory(args.path, jobs=args.jobs)
     else:
         print(f"错误: 路径 {args.path} 不存在")
         return 1
     
+    if cache:
+        cache.save()
+    
     checker.print_report()
     
     # 确定退出码
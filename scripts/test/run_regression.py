@@ -10,11 +10,18 @@ import os
 import sys
 import json
 import time
+import hashlib
 import argparse
+import tempfile
+import threading
 import subprocess
+from collections import Counter, deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import chain, repeat
 from pathlib import Path
 from datetime import datetime
-from typing import Dict, List, Any, Optional
+from functools import lru_cache
+from typing import Dict, List, Any, Optional, Tuple
 
 import yaml
 from loguru import logger
@@ -25,6 +32,42 @@ SIM_DIR = PROJECT_ROOT / "sim"
 RTL_DIR = PROJECT_ROOT / "rtl"
 RESULTS_DIR = SIM_DIR / "results"
 
+# 仿真输出只保留最后若干行用于报告
+SIM_OUTPUT_TAIL_LINES = 1000
+# JSON报告中每个测试的stdout只保留最后若干行
+REPORT_STDOUT_TAIL_LINES = 200
+
+def _prune_details(details: Dict[str, Any]) -> Dict[str, Any]:
+    """裁剪测试详情中的stdout，避免报告过大"""
+    stdout = details.get("stdout")
+    if not stdout:
+        return details
+    lines = stdout.splitlines(keepends=True)
+    if len(lines) <= REPORT_STDOUT_TAIL_LINES:
+        return details
+    return {**details, "stdout": "".join(lines[-REPORT_STDOUT_TAIL_LINES:])}
+
+@lru_cache(maxsize=1)
+def _rtl_sources() -> Tuple[str, ...]:
+    """RTL源文件列表（只遍历一次目录树）"""
+    return tuple(str(f) for f in chain(RTL_DIR.rglob("*.v"), RTL_DIR.rglob("*.sv")))
+
+def _source_fingerprint(paths) -> str:
+    """源文件指纹：路径 + mtime + 大小，任一文件变化即失效"""
+    h = hashlib.sha256()
+    for path in paths:
+        st = os.stat(path)
+        h.update(f"{path}:{st.st_mtime_ns}:{st.st_size}\n".encode())
+    return h.hexdigest()
+
+def _include_headers() -> List[str]:
+    """编译命令中-I目录下的头文件"""
+    headers = []
+    for inc_dir in (RTL_DIR / "common", RTL_DIR / "lc3plus", SIM_DIR / "testbench"):
+        if inc_dir.is_dir():
+            headers.extend(str(f) for ext in ("*.vh", "*.svh") for f in inc_dir.glob(ext))
+    return sorted(headers)
+
 class TestResult:
     """测试结果类"""
     def __init__(self, name: str, status: str, duration: float, 
@@ -43,18 +86,25 @@ class RegressionRunner:
         self.results: List[TestResult] = []
         self.start_time = None
         self.end_time = None
+        self._summary_cache: Optional[Tuple[Any, Dict[str, Any]]] = None
+        self._rtl_files = list(_rtl_sources())
+        self._rtl_fingerprint = _source_fingerprint(self._rtl_files + _include_headers())
         
         # 确保结果目录存在
         RESULTS_DIR.mkdir(parents=True, exist_ok=True)
         
-        # 配置日志
+        # 本次运行的时间戳，日志和报告文件名共用
+        self._run_stamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+        
+        # 配置日志（enqueue=True：并行测试进程的日志经队列串行写出）
         logger.remove()
         logger.add(
-            RESULTS_DIR / f"regression_{datetime.now().strftime('%Y%m%d_%H%M%S')}.log",
+            RESULTS_DIR / f"regression_{self._run_stamp}.log",
             level="DEBUG",
-            format="{time:YYYY-MM-DD HH:mm:ss} | {level} | {message}"
+            format="{time:YYYY-MM-DD HH:mm:ss} | {level} | {message}",
+            enqueue=True
         )
-        logger.add(sys.stdout, level="INFO")
+        logger.add(sys.stdout, level="INFO", enqueue=True)
     
     def _load_config(self, config_file: Optional[str]) -> Dict[str, Any]:
         """加载配置文件"""
@@ -73,6 +123,7 @@ class RegressionRunner:
                 "timeout": 3600,  # 1小时超时
                 "parallel_jobs": 4,
                 "coverage_enabled": True,
+                "compile_cache": True,
                 "waveform_enabled": False
             }
         
@@ -82,8 +133,6 @@ class RegressionRunner:
     def run_unit_tests(self) -> List[TestResult]:
         """运行单元测试"""
         logger.info("Running unit tests...")
-        results = []
-        
         unit_tests = [
             ("test_dsp_multiply", "tb_dsp_multiply.sv"),
             ("test_memory_controller", "tb_memory_ctrl.sv"),
@@ -91,17 +140,11 @@ class RegressionRunner:
             ("test_register_bank", "tb_reg_bank.sv"),
         ]
         
-        for test_name, testbench in unit_tests:
-            result = self._run_single_test(test_name, testbench, "unit")
-            results.append(result)
-            
-        return results
+        return self._run_tests(unit_tests, "unit")
     
     def run_module_tests(self) -> List[TestResult]:
         """运行模块级测试"""
         logger.info("Running module tests...")
-        results = []
-        
         module_tests = [
             ("test_mdct_engine", "tb_mdct.sv"),
             ("test_quantizer", "tb_quantizer.sv"),
@@ -109,17 +152,11 @@ class RegressionRunner:
             ("test_bitstream_parser", "tb_bitstream.sv"),
         ]
         
-        for test_name, testbench in module_tests:
-            result = self._run_single_test(test_name, testbench, "module")
-            results.append(result)
-            
-        return results
+        return self._run_tests(module_tests, "module")
     
     def run_system_tests(self) -> List[TestResult]:
         """运行系统级测试"""
         logger.info("Running system tests...")
-        results = []
-        
         system_tests = [
             ("test_lc3plus_encoder", "tb_lc3plus_encoder.sv"),
             ("test_lc3plus_decoder", "tb_lc3plus_decoder.sv"),
@@ -127,28 +164,43 @@ class RegressionRunner:
             ("test_multi_channel", "tb_multi_channel.sv"),
         ]
         
-        for test_name, testbench in system_tests:
-            result = self._run_single_test(test_name, testbench, "system")
-            results.append(result)
-            
-        return results
+        return self._run_tests(system_tests, "system")
     
     def run_performance_tests(self) -> List[TestResult]:
         """运行性能测试"""
         logger.info("Running performance tests...")
-        results = []
-        
         perf_tests = [
             ("test_latency", "tb_latency_measurement.sv"),
             ("test_throughput", "tb_throughput_measurement.sv"),
             ("test_power", "tb_power_estimation.sv"),
         ]
         
-        for test_name, testbench in perf_tests:
-            result = self._run_single_test(test_name, testbench, "performance")
-            results.append(result)
-            
-        return results
+        return self._run_tests(perf_tests, "performance")
+    
+    def _run_tests(self, tests: List[Tuple[str, str]], test_type: str) -> List[TestResult]:
+        """并行运行一组测试，结果顺序与tests一致"""
+        jobs = self.config.get("parallel_jobs", 4)
+        if jobs <= 1 or len(tests) <= 1:
+            return [self._run_single_test(name, tb, test_type) for name, tb in tests]
+        
+        # 每个测试的编译产物(-o test_name)和仿真进程互不相关，可直接按进程并行
+        names, testbenches = zip(*tests)
+        with ProcessPoolExecutor(max_workers=min(jobs, len(tests))) as executor:
+            return list(executor.map(self._run_single_test, names, testbenches,
+                                     repeat(test_type)))
+    
+    def _compile_key(self, compile_cmd: List[str], testbench_path: Path) -> Optional[str]:
+        """编译缓存键：编译命令 + RTL/头文件指纹 + testbench指纹"""
+        if not self.config.get("compile_cache", True):
+            return None
+        try:
+            tb_fingerprint = _source_fingerprint([str(testbench_path)])
+        except OSError:
+            return None
+        h = hashlib.sha256("\0".join(compile_cmd).encode())
+        h.update(self._rtl_fingerprint.encode())
+        h.update(tb_fingerprint.encode())
+        return h.hexdigest()
     
     def _run_single_test(self, test_name: str, testbench: str, 
                         test_type: str) -> TestResult:
@@ -170,50 +222,41 @@ class RegressionRunner:
             ]
             
             # 添加RTL源文件
-            rtl_files = list(RTL_DIR.rglob("*.v")) + list(RTL_DIR.rglob("*.sv"))
-            compile_cmd.extend([str(f) for f in rtl_files])
+            compile_cmd.extend(self._rtl_files)
             
             logger.debug(f"Compile command: {' '.join(compile_cmd)}")
             
-            result = subprocess.run(
-                compile_cmd,
-                cwd=SIM_DIR,
-                capture_output=True,
-                text=True,
-                timeout=300  # 5分钟编译超时
-            )
-            
-            if result.returncode != 0:
-                duration = time.time() - start_time
-                return TestResult(
-                    test_name, "ERROR", duration,
-                    {"error": "Compilation failed", "stderr": result.stderr}
+            # 源文件和编译命令都没变时直接复用上次编译的仿真文件
+            stamp_file = SIM_DIR / f".{test_name}.compile_stamp"
+            compile_key = self._compile_key(compile_cmd, SIM_DIR / "testbench" / testbench)
+            if (compile_key is not None and (SIM_DIR / test_name).exists()
+                    and stamp_file.exists() and stamp_file.read_text() == compile_key):
+                logger.debug(f"Reusing compiled {test_name} (sources unchanged)")
+            else:
+                stamp_file.unlink(missing_ok=True)
+                result = subprocess.run(
+                    compile_cmd,
+                    cwd=SIM_DIR,
+                    capture_output=True,
+                    text=True,
+                    timeout=300  # 5分钟编译超时
                 )
+                
+                if result.returncode != 0:
+                    duration = time.time() - start_time
+                    return TestResult(
+                        test_name, "ERROR", duration,
+                        {"error": "Compilation failed", "stderr": result.stderr}
+                    )
+                
+                if compile_key is not None:
+                    stamp_file.write_text(compile_key)
             
             # 运行仿真
             sim_cmd = ["vvp", test_name]
-            result = subprocess.run(
-                sim_cmd,
-                cwd=SIM_DIR,
-                capture_output=True,
-                text=True,
-                timeout=self.config.get("timeout", 3600)
-            )
+            status, details = self._run_simulation(sim_cmd)
             
             duration = time.time() - start_time
-            
-            # 解析结果
-            if result.returncode == 0 and "TEST_PASS" in result.stdout:
-                status = "PASS"
-                details = {"stdout": result.stdout}
-            else:
-                status = "FAIL"
-                details = {
-                    "stdout": result.stdout,
-                    "stderr": result.stderr,
-                    "returncode": result.returncode
-                }
-            
             return TestResult(test_name, status, duration, details)
             
         except subprocess.TimeoutExpired:
@@ -229,6 +272,52 @@ class RegressionRunner:
                 {"error": str(e)}
             )
     
+    def _run_simulation(self, sim_cmd: List[str]) -> Tuple[str, Dict[str, Any]]:
+        """流式运行仿真：逐行扫描输出，遇到TEST_FAIL立即结束，只保留输出末尾"""
+        timeout = self.config.get("timeout", 3600)
+        timed_out = threading.Event()
+        tail = deque(maxlen=SIM_OUTPUT_TAIL_LINES)
+        seen_pass = seen_fail = False
+        
+        # stderr写临时文件，避免两个管道互相阻塞
+        with tempfile.TemporaryFile(mode="w+") as err_file, subprocess.Popen(
+                sim_cmd, cwd=SIM_DIR, stdout=subprocess.PIPE, stderr=err_file,
+                text=True, bufsize=1) as proc:
+            def _kill():
+                timed_out.set()
+                proc.kill()
+            
+            timer = threading.Timer(timeout, _kill)
+            timer.start()
+            try:
+                for line in proc.stdout:
+                    tail.append(line)
+                    if "TEST_FAIL" in line:
+                        seen_fail = True
+                        proc.terminate()
+                        break
+                    if "TEST_PASS" in line:
+                        seen_pass = True
+                returncode = proc.wait()
+            finally:
+                timer.cancel()
+            
+            if timed_out.is_set():
+                raise subprocess.TimeoutExpired(sim_cmd, timeout)
+            
+            err_file.seek(0)
+            stderr = err_file.read()
+        
+        # 解析结果
+        stdout = "".join(tail)
+        if returncode == 0 and seen_pass and not seen_fail:
+            return "PASS", {"stdout": stdout}
+        return "FAIL", {
+            "stdout": stdout,
+            "stderr": stderr,
+            "returncode": returncode
+        }
+    
     def run_coverage_analysis(self) -> TestResult:
         """运行覆盖率分析"""
         logger.info("Running coverage analysis...")
@@ -294,11 +383,16 @@ class RegressionRunner:
         return summary
     
     def _generate_summary(self) -> Dict[str, Any]:
-        """生成测试摘要"""
+        """生成测试摘要（结果未变化时直接返回缓存）"""
+        cache_key = (len(self.results), self.end_time)
+        if self._summary_cache is not None and self._summary_cache[0] == cache_key:
+            return self._summary_cache[1]
+        
         total_tests = len(self.results)
-        passed = sum(1 for r in self.results if r.status == "PASS")
-        failed = sum(1 for r in self.results if r.status == "FAIL")
-        errors = sum(1 for r in self.results if r.status == "ERROR")
+        counts = Counter(r.status for r in self.results)
+        passed = counts["PASS"]
+        failed = counts["FAIL"]
+        errors = counts["ERROR"]
         
         duration = (self.end_time - self.start_time).total_seconds()
         
@@ -313,6 +407,7 @@ class RegressionRunner:
             "end_time": self.end_time.isoformat()
         }
         
+        self._summary_cache = (cache_key, summary)
         return summary
     
     def _generate_detailed_report(self):
@@ -325,7 +420,7 @@ class RegressionRunner:
                     "status": r.status,
                     "duration": r.duration,
                     "timestamp": r.timestamp.isoformat(),
-                    "details": r.details
+                    "details": _prune_details(r.details)
                 }
                 for r in self.results
             ],
@@ -333,9 +428,13 @@ class RegressionRunner:
         }
         
         # 保存JSON报告
-        report_file = RESULTS_DIR / f"regression_report_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
-        with open(report_file, 'w') as f:
-            json.dump(report, f, indent=2)
+        report_file = RESULTS_DIR / f"regression_report_{self._run_stamp}.json"
+        pretty = self.config.get("report_pretty", False)
+        with open(report_file, 'w', buffering=1 << 20) as f:
+            if pretty:
+                json.dump(report, f, indent=2)
+            else:
+                json.dump(report, f, separators=(',', ':'))
         
         # 生成HTML报告
         self._generate_html_report(report)
@@ -350,14 +449,14 @@ class RegressionRunner:
         <head>
             <title>Audio Codec Regression Test Report</title>
             <style>
-                body { font-family: Arial, sans-serif; margin: 20px; }
-                .summary { background: #f5f5f5; padding: 15px; border-radius: 5px; }
-                .pass { color: green; }
-                .fail { color: red; }
-                .error { color: orange; }
-                table { border-collapse: collapse; width: 100%; }
-                th, td { border: 1px solid #ddd; padding: 8px; text-align: left; }
-                th { background-color: #f2f2f2; }
+                body {{ font-family: Arial, sans-serif; margin: 20px; }}
+                .summary {{ background: #f5f5f5; padding: 15px; border-radius: 5px; }}
+                .pass {{ color: green; }}
+                .fail {{ color: red; }}
+                .error {{ color: orange; }}
+                table {{ border-collapse: collapse; width: 100%; }}
+                th, td {{ border: 1px solid #ddd; padding: 8px; text-align: left; }}
+                th {{ background-color: #f2f2f2; }}
             </style>
         </head>
         <body>
@@ -387,17 +486,17 @@ class RegressionRunner:
         </html>
         """
         
-        test_rows = ""
-        for result in report["test_results"]:
-            status_class = result["status"].lower()
-            test_rows += f"""
+        test_rows = "".join(
+            f"""
                 <tr>
                     <td>{result["name"]}</td>
-                    <td class="{status_class}">{result["status"]}</td>
+                    <td class="{result["status"].lower()}">{result["status"]}</td>
                     <td>{result["duration"]:.2f}</td>
                     <td>{result["timestamp"]}</td>
                 </tr>
             """
+            for result in report["test_results"]
+        )
         
         html_content = html_template.format(
             total_tests=report["summary"]["total_tests"],
@@ -409,9 +508,8 @@ class RegressionRunner:
             test_rows=test_rows
         )
         
-        html_file = RESULTS_DIR / f"regression_report_{datetime.now().strftime('%Y%m%d_%H%M%S')}.html"
-        with open(html_file, 'w') as f:
-            f.write(html_content)
+        html_file = RESULTS_DIR / f"regression_report_{self._run_stamp}.html"
+        html_file.write_text(html_content)
 
 def main():
     """主函数"""
@@ -421,11 +519,20 @@ def main():
                        default="all", help="Test suite to run")
     parser.add_argument("--coverage", action="store_true", help="Enable coverage analysis")
     parser.add_argument("--verbose", "-v", action="store_true", help="Verbose output")
+    parser.add_argument("--jobs", "-j", type=int, help="Parallel test jobs (overrides parallel_jobs)")
+    parser.add_argument("--no-compile-cache", action="store_true", help="Always recompile testbenches")
+    parser.add_argument("--pretty", action="store_true", help="Write an indented (human-readable) JSON report")
     
     args = parser.parse_args()
     
     # 创建运行器
     runner = RegressionRunner(args.config)
+    if args.jobs is not None:
+        runner.config["parallel_jobs"] = args.jobs
+    if args.no_compile_cache:
+        runner.config["compile_cache"] = False
+    if args.pretty:
+        runner.config["report_pretty"] = True
     
     # 运行测试
     if args.suite == "all":
@@ -443,6 +550,9 @@ def main():
         runner.results.extend(runner.run_performance_tests())
         summary = runner._generate_summary()
     
+    # 等待队列中的日志全部写出
+    logger.complete()
+    
     # 输出结果
     if summary["failed"] > 0 or summary["errors"] > 0:
         sys.exit(1)
@@ -13,10 +13,50 @@ Based on JSON register map configuration.
 
 import json
 import argparse
+import hashlib
+import os
 import sys
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import Dict, List, Any
-from datetime import datetime
+from typing import Dict, List, Any, NamedTuple, Tuple
+from datetime import datetime, timezone
+
+import numpy as np
+from jinja2 import Environment, FileSystemLoader, StrictUndefined
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+TEMPLATE_DIR = Path(__file__).parent / "templates"
+STAMP_FILE = ".gen_stamp"
+
+class FieldRecord(NamedTuple):
+    """Register field; bits stays raw and is parsed only by the C header generator"""
+    name: str
+    bits: str
+    access: str
+    reset_value: str
+    description: str
+
+class RegisterRecord(NamedTuple):
+    """Register entry normalized once for all generators"""
+    name: str
+    name_lc: str
+    address: str
+    reset_value: str
+    access: str
+    writable: bool
+    description: str
+    fields: List[FieldRecord]
+
+def parse_bits(bits: str) -> Tuple[int, int, bool]:
+    """Parse "hi:lo" or "n" into (high, low, single_bit)"""
+    high, sep, low = bits.partition(":")
+    if sep:
+        return int(high), int(low), False
+    return int(high), int(high), True
 
 class RegisterGenerator:
     """Register code generator"""
@@ -24,307 +64,194 @@ class RegisterGenerator:
     def __init__(self, json_file: str):
         self.json_file = Path(json_file)
         self.config = self._load_config()
+        self.regs = self._normalize_registers()
         self.output_dir = Path("generated")
         self.output_dir.mkdir(exist_ok=True)
+        self.templates = self._load_templates()
+        self.timestamp = self._build_timestamp()
         
     def _load_config(self) -> Dict[str, Any]:
         """Load JSON configuration"""
         if not self.json_file.exists():
             raise FileNotFoundError(f"Register map file not found: {self.json_file}")
             
-        with open(self.json_file, 'r') as f:
-            return json.load(f)
+        self._json_bytes = self.json_file.read_bytes()
+        if orjson is not None:
+            return orjson.loads(self._json_bytes)
+        return json.loads(self._json_bytes)
     
-    def generate_all(self):
-        """Generate all output files"""
-        print(f"Generating register files from {self.json_file}")
-        
-        # Generate SystemVerilog
-        self.generate_systemverilog()
-        
-        # Generate C header
-        self.generate_c_header()
-        
-        # Generate Python test
-        self.generate_python_test()
-        
-        # Generate documentation
-        self.generate_documentation()
-        
-        print("Register generation completed!")
+    def _normalize_registers(self) -> List[RegisterRecord]:
+        """Walk the register list once and build records shared by all generators"""
+        regs = []
+        for r in self.config["register_map"]["registers"]:
+            fields = []
+            for f in r.get("fields", []):
+                fields.append(FieldRecord(
+                    name=f["name"], bits=f["bits"],
+                    access=f.get("access", ""), reset_value=f.get("reset_value", ""),
+                    description=f.get("description", ""),
+                ))
+            regs.append(RegisterRecord(
+                name=r["name"],
+                name_lc=r["name"].lower(),
+                address=r["address"],
+                reset_value=r["reset_value"],
+                access=r["access"],
+                writable=r["access"] in ("RW", "WO"),
+                description=r["description"],
+                fields=fields,
+            ))
+        return regs
     
-    def generate_systemverilog(self):
-        """Generate SystemVerilog register module"""
-        reg_map = self.config["register_map"]
-        module_name = f"{reg_map['module_name']}_regs"
-        
-        sv_content = f'''/*
- * Auto-generated SystemVerilog Register Module
- * Generated from: {self.json_file.name}
- * Generated on: {datetime.now().strftime("%Y-%m-%d %H:%M:%S")}
- * 
- * DO NOT EDIT MANUALLY - This file is auto-generated
- */
-
-module {module_name} #(
-    parameter ADDR_WIDTH = {reg_map["address_width"]},
-    parameter DATA_WIDTH = {reg_map["data_width"]},
-    parameter string REG_MAP_FILE = "{self.json_file.name}"
-) (
-    input  logic                     clk,
-    input  logic                     rst_n,
+    @staticmethod
+    def _build_timestamp() -> str:
+        """Timestamp stamped into every output, honoring SOURCE_DATE_EPOCH"""
+        epoch = os.environ.get("SOURCE_DATE_EPOCH")
+        if epoch:
+            when = datetime.fromtimestamp(int(epoch), tz=timezone.utc)
+        else:
+            when = datetime.now()
+        return when.strftime("%Y-%m-%d %H:%M:%S")
     
-    // Register Interface
-    input  logic [ADDR_WIDTH-1:0]   reg_addr,
-    input  logic [DATA_WIDTH-1:0]   reg_wdata,
-    output logic [DATA_WIDTH-1:0]   reg_rdata,
-    input  logic                     reg_wen,
-    input  logic                     reg_ren,
-    output logic                     reg_ready,
-    output logic                     reg_error,
+    def _template_version(self) -> str:
+        """Hash of the generator script and all templates"""
+        h = hashlib.sha256(Path(__file__).read_bytes())
+        for tpl in sorted(TEMPLATE_DIR.glob("*.j2")):
+            h.update(tpl.read_bytes())
+        return h.hexdigest()
     
-    // Configuration Outputs
-'''
-        
-        # Generate configuration outputs
-        config_signals = [
-            "output logic [31:0] config_sample_rate",
-            "output logic [31:0] config_bitrate", 
-            "output logic [31:0] config_frame_length",
-            "output logic [3:0]  config_channels",
-            "output logic [1:0]  config_codec_type",
-            "output logic [1:0]  config_mode",
-            "output logic        config_enable",
-            "output logic        config_start",
-            "output logic        config_soft_reset",
-            "output logic        config_irq_enable"
-        ]
-        
-        for signal in config_signals:
-            sv_content += f"    {signal},\n"
-        
-        # Generate status inputs
-        sv_content += "\n    // Status Inputs\n"
-        status_signals = [
-            "input  logic [31:0] status_main",
-            "input  logic [31:0] status_irq", 
-            "input  logic [31:0] status_frame_count",
-            "input  logic [31:0] status_perf_counter",
-            "input  logic [31:0] status_debug0",
-            "input  logic [31:0] status_debug1"
+    def _stamp(self) -> str:
+        """Fingerprint of the inputs that determine the generated files"""
+        key = hashlib.sha256(self._json_bytes).hexdigest()
+        return f"{key}\n{self._template_version()}\n"
+    
+    def _output_files(self) -> List[Path]:
+        """Paths written by generate_all"""
+        name = self.config["register_map"]["module_name"]
+        return [
+            self.output_dir / f"{name}_regs.sv",
+            self.output_dir / f"{name}_regs.h",
+            self.output_dir / f"test_{name}_regs.py",
+            self.output_dir / f"{name}_register_map.md",
         ]
-        
-        for signal in status_signals:
-            sv_content += f"    {signal},\n"
-        
-        # Generate buffer and interrupt signals
-        sv_content += """
-    // Buffer Configuration
-    output logic [31:0] input_buffer_addr,
-    output logic [31:0] output_buffer_addr,
-    output logic [15:0] input_buffer_size,
-    output logic [15:0] output_buffer_size,
     
-    // Interrupt Status
-    input  logic        irq_frame_done,
-    input  logic        irq_encode_done,
-    input  logic        irq_decode_done,
-    input  logic        irq_error_in
-);
-
-    // Register definitions
-"""
-        
-        # Generate register definitions
-        for reg in reg_map["registers"]:
-            reg_name = reg["name"].lower()
-            sv_content += f"    logic [DATA_WIDTH-1:0] {reg_name};\n"
-        
-        # Generate register access logic
-        sv_content += """
-    // Register access logic
-    always_ff @(posedge clk or negedge rst_n) begin
-        if (!rst_n) begin
-            // Reset all registers to default values
-"""
-        
-        for reg in reg_map["registers"]:
-            reg_name = reg["name"].lower()
-            reset_val = reg["reset_value"]
-            sv_content += f"            {reg_name} <= {reset_val};\n"
-        
-        sv_content += "            reg_ready <= 1'b0;\n"
-        sv_content += "            reg_error <= 1'b0;\n"
-        sv_content += "        end else begin\n"
-        sv_content += "            reg_ready <= 1'b1;\n"
-        sv_content += "            reg_error <= 1'b0;\n"
-        sv_content += "            \n"
-        sv_content += "            // Write operations\n"
-        sv_content += "            if (reg_wen) begin\n"
-        sv_content += "                case (reg_addr)\n"
-        
-        # Generate write case statements
-        for reg in reg_map["registers"]:
-            if reg["access"] in ["RW", "WO"]:
-                reg_name = reg["name"].lower()
-                addr = reg["address"]
-                sv_content += f"                    {addr}: {reg_name} <= reg_wdata;\n"
-        
-        sv_content += "                    default: reg_error <= 1'b1;\n"
-        sv_content += "                endcase\n"
-        sv_content += "            end\n"
-        sv_content += "            \n"
-        
-        # Generate status register updates
-        sv_content += "            // Update status registers\n"
-        status_regs = {
-            "reg_status": "status_main",
-            "reg_irq_status": "status_irq",
-            "reg_frame_count": "status_frame_count", 
-            "reg_perf_counter": "status_perf_counter",
-            "reg_debug0": "status_debug0",
-            "reg_debug1": "status_debug1"
+    def _stamp_matches(self, stamp: str) -> bool:
+        """True if output_dir already holds files generated from the same inputs"""
+        stamp_file = self.output_dir / STAMP_FILE
+        try:
+            if stamp_file.read_text() != stamp:
+                return False
+        except OSError:
+            return False
+        return all(f.exists() for f in self._output_files())
+    
+    def _load_templates(self) -> Dict[str, Any]:
+        """Compile all output templates once up front"""
+        env = Environment(
+            loader=FileSystemLoader(str(TEMPLATE_DIR)),
+            auto_reload=False,
+            trim_blocks=True,
+            lstrip_blocks=True,
+            keep_trailing_newline=True,
+            undefined=StrictUndefined,
+        )
+        return {
+            "sv": env.get_template("sv.j2"),
+            "c_header": env.get_template("c_hdr.j2"),
+            "python_test": env.get_template("py_test.j2"),
+            "doc": env.get_template("doc.md.j2"),
         }
+    
+    @staticmethod
+    def _write_atomic(output_file: Path, data: bytes):
+        """Write via a temp file + rename so readers never see a partial file"""
+        tmp = output_file.with_name(output_file.name + ".tmp")
+        tmp.write_bytes(data)
+        os.replace(tmp, output_file)
+    
+    def _render(self, name: str, output_file: Path, **context):
+        """Render a template and write it to the output file"""
+        reg_map = self.config["register_map"]
+        content = self.templates[name].render(
+            reg_map=reg_map,
+            regs=self.regs,
+            json_name=self.json_file.name,
+            generated_on=self.timestamp,
+            **context,
+        )
+        self._write_atomic(output_file, content.encode("utf-8"))
+    
+    def generate_all(self, force: bool = False):
+        """Generate all output files"""
+        stamp = self._stamp()
+        if not force and self._stamp_matches(stamp):
+            print(f"Register files in {self.output_dir} are up to date (cache hit)")
+            return
         
-        for reg_name, status_signal in status_regs.items():
-            sv_content += f"            {reg_name} <= {status_signal};\n"
-        
-        sv_content += "        end\n"
-        sv_content += "    end\n"
-        sv_content += "    \n"
-        
-        # Generate read logic
-        sv_content += "    // Read operations\n"
-        sv_content += "    always_comb begin\n"
-        sv_content += "        reg_rdata = 32'h0;\n"
-        sv_content += "        if (reg_ren) begin\n"
-        sv_content += "            case (reg_addr)\n"
-        
-        for reg in reg_map["registers"]:
-            reg_name = reg["name"].lower()
-            addr = reg["address"]
-            sv_content += f"                {addr}: reg_rdata = {reg_name};\n"
-        
-        sv_content += "                default: reg_rdata = 32'h0;\n"
-        sv_content += "            endcase\n"
-        sv_content += "        end\n"
-        sv_content += "    end\n"
-        sv_content += "    \n"
+        print(f"Generating register files from {self.json_file}")
         
-        # Generate output assignments
-        sv_content += "    // Configuration output assignments\n"
-        config_assigns = [
-            ("config_sample_rate", "reg_sample_rate"),
-            ("config_bitrate", "reg_bitrate"),
-            ("config_frame_length", "reg_frame_len"),
-            ("config_channels", "reg_channels[3:0]"),
-            ("config_codec_type", "reg_control[5:4]"),
-            ("config_mode", "reg_control[3:2]"),
-            ("config_enable", "reg_control[0]"),
-            ("config_start", "reg_control[1]"),
-            ("config_soft_reset", "reg_control[7]"),
-            ("config_irq_enable", "reg_control[6]"),
-            ("input_buffer_addr", "reg_input_addr"),
-            ("output_buffer_addr", "reg_output_addr"),
-            ("input_buffer_size", "reg_buffer_size[15:0]"),
-            ("output_buffer_size", "reg_buffer_size[31:16]")
+        # The generators only read shared state and each writes its own file
+        generators = [
+            self.generate_systemverilog,
+            self.generate_c_header,
+            self.generate_python_test,
+            self.generate_documentation,
         ]
+        with ThreadPoolExecutor(max_workers=len(generators)) as ex:
+            list(ex.map(lambda gen: gen(), generators))
         
-        for output_name, reg_field in config_assigns:
-            sv_content += f"    assign {output_name} = {reg_field};\n"
-        
-        sv_content += "\nendmodule\n"
+        self._write_atomic(self.output_dir / STAMP_FILE, stamp.encode("utf-8"))
+        print("Register generation completed!")
+    
+    def generate_systemverilog(self):
+        """Generate SystemVerilog register module"""
+        reg_map = self.config["register_map"]
+        module_name = f"{reg_map['module_name']}_regs"
         
-        # Write to file
         output_file = self.output_dir / f"{module_name}.sv"
-        with open(output_file, 'w') as f:
-            f.write(sv_content)
+        self._render("sv", output_file, module_name=module_name)
         
         print(f"Generated SystemVerilog: {output_file}")
     
     def generate_c_header(self):
         """Generate C header file"""
         reg_map = self.config["register_map"]
-        module_name = reg_map["module_name"].upper()
         
-        header_content = f'''/*
- * Auto-generated C Header File for {reg_map["description"]}
- * Generated from: {self.json_file.name}
- * Generated on: {datetime.now().strftime("%Y-%m-%d %H:%M:%S")}
- * 
- * DO NOT EDIT MANUALLY - This file is auto-generated
- */
-
-#ifndef {module_name}_REGS_H
-#define {module_name}_REGS_H
-
-#include <stdint.h>
-
-/* Version Information */
-#define {module_name}_VERSION_MAJOR  {reg_map["version"].split('.')[0]}
-#define {module_name}_VERSION_MINOR  {reg_map["version"].split('.')[1]}
-#define {module_name}_VERSION_PATCH  {reg_map["version"].split('.')[2]}
-
-/* Register Addresses */
-'''
-        
-        # Generate register address defines
-        for reg in reg_map["registers"]:
-            reg_name = reg["name"]
-            addr = reg["address"]
-            description = reg["description"]
-            header_content += f"#define {reg_name:<25} {addr:<10}  /* {description} */\n"
-        
-        header_content += "\n/* Register Field Definitions */\n"
-        
-        # Generate field definitions
-        for reg in reg_map["registers"]:
-            reg_name = reg["name"]
-            if "fields" in reg:
-                for field in reg["fields"]:
-                    field_name = f"{reg_name}_{field['name']}"
-                    bits = field["bits"]
-                    
-                    if ":" in bits:
-                        # Multi-bit field
-                        high, low = bits.split(":")
-                        high, low = int(high), int(low)
-                        width = high - low + 1
-                        mask = (1 << width) - 1
-                        header_content += f"#define {field_name}_SHIFT {low:>15}\n"
-                        header_content += f"#define {field_name}_MASK  0x{mask:08X}\n"
-                        header_content += f"#define {field_name}_GET(x)   (((x) >> {low}) & 0x{mask:X})\n"
-                        header_content += f"#define {field_name}_SET(x)   (((x) & 0x{mask:X}) << {low})\n"
-                    else:
-                        # Single bit field
-                        bit_pos = int(bits)
-                        header_content += f"#define {field_name}_BIT    {bit_pos:>15}\n"
-                        header_content += f"#define {field_name}_MASK   0x{1 << bit_pos:08X}\n"
-                    
-                    header_content += "\n"
-        
-        # Generate utility functions
-        header_content += '''
-/* Utility Functions */
-static inline uint32_t audio_codec_read_reg(uintptr_t base, uint32_t offset) {
-    return *((volatile uint32_t*)(base + offset));
-}
-
-static inline void audio_codec_write_reg(uintptr_t base, uint32_t offset, uint32_t value) {
-    *((volatile uint32_t*)(base + offset)) = value;
-}
-
-/* Helper Macros */
-#define AUDIO_CODEC_READ(base, reg)        audio_codec_read_reg(base, reg)
-#define AUDIO_CODEC_WRITE(base, reg, val)  audio_codec_write_reg(base, reg, val)
-
-#endif /* {module_name}_REGS_H */
-'''
+        # Parse the bit ranges, then compute shift/mask vectorized
+        names, hi, lo, single = [], [], [], []
+        for reg in self.regs:
+            for field in reg.fields:
+                try:
+                    high, low, is_single = parse_bits(field.bits)
+                except ValueError:
+                    raise ValueError(
+                        f"{reg.name}.{field.name}: invalid bits {field.bits!r} "
+                        f"(expected \"hi:lo\" or \"n\")") from None
+                names.append(f"{reg.name}_{field.name}")
+                hi.append(high)
+                lo.append(low)
+                single.append(is_single)
+        
+        hi = np.array(hi, dtype=np.int64)
+        lo = np.array(lo, dtype=np.int64)
+        single = np.array(single, dtype=bool)
+        widths = (hi - lo + 1).astype(np.uint64)
+        one = np.uint64(1)
+        masks = np.where(single,
+                         one << lo.astype(np.uint64),
+                         (one << widths) - one)
+        
+        fields = [
+            {"name": name, "low": low, "mask": mask, "single": is_single}
+            for name, low, mask, is_single
+            in zip(names, lo.tolist(), masks.tolist(), single.tolist())
+        ]
         
-        # Write to file
         output_file = self.output_dir / f"{reg_map['module_name']}_regs.h"
-        with open(output_file, 'w') as f:
-            f.write(header_content)
+        self._render("c_header", output_file,
+                     guard=reg_map["module_name"].upper(),
+                     version=reg_map["version"].split('.'),
+                     fields=fields)
         
         print(f"Generated C header: {output_file}")
     
@@ -332,66 +259,9 @@ static inline void audio_codec_write_reg(uintptr_t base, uint32_t offset, uint32
         """Generate Python test script"""
         reg_map = self.config["register_map"]
         
-        test_content = f'''#!/usr/bin/env python3
-"""
-Auto-generated Python Test Script for {reg_map["description"]}
-Generated from: {self.json_file.name}
-Generated on: {datetime.now().strftime("%Y-%m-%d %H:%M:%S")}
-
-DO NOT EDIT MANUALLY - This file is auto-generated
-"""
-
-import pytest
-from typing import Dict, Any
-
-class {reg_map["module_name"].title()}RegisterTest:
-    """Test class for {reg_map["description"]}"""
-    
-    def __init__(self):
-        self.registers = {{
-'''
-        
-        # Generate register dictionary
-        for reg in reg_map["registers"]:
-            test_content += f'            "{reg["name"]}": {{\n'
-            test_content += f'                "address": {reg["address"]},\n'
-            test_content += f'                "reset_value": {reg["reset_value"]},\n'
-            test_content += f'                "access": "{reg["access"]}",\n'
-            test_content += f'                "description": "{reg["description"]}"\n'
-            test_content += '            },\n'
-        
-        test_content += '''        }
-    
-    def test_register_addresses(self):
-        """Test that all register addresses are unique"""
-        addresses = [reg["address"] for reg in self.registers.values()]
-        assert len(addresses) == len(set(addresses)), "Duplicate register addresses found"
-    
-    def test_reset_values(self):
-        """Test register reset values"""
-        for name, reg in self.registers.items():
-            reset_val = reg["reset_value"]
-            # Verify reset value is valid 32-bit value
-            assert 0 <= int(reset_val, 16) <= 0xFFFFFFFF, f"Invalid reset value for {name}"
-    
-    def test_access_permissions(self):
-        """Test register access permissions"""
-        valid_access = ["RO", "RW", "WO", "RW1C"]
-        for name, reg in self.registers.items():
-            assert reg["access"] in valid_access, f"Invalid access type for {name}: {reg['access']}"
-
-if __name__ == "__main__":
-    test = {reg_map["module_name"].title()}RegisterTest()
-    test.test_register_addresses()
-    test.test_reset_values()
-    test.test_access_permissions()
-    print("All register tests passed!")
-'''
-        
-        # Write to file
         output_file = self.output_dir / f"test_{reg_map['module_name']}_regs.py"
-        with open(output_file, 'w') as f:
-            f.write(test_content)
+        self._render("python_test", output_file,
+                     class_name=reg_map["module_name"].title())
         
         print(f"Generated Python test: {output_file}")
     
@@ -399,93 +269,8 @@ if __name__ == "__main__":
         """Generate Markdown documentation"""
         reg_map = self.config["register_map"]
         
-        doc_content = f'''# {reg_map["description"]} Register Map
-
-**Version:** {reg_map["version"]}  
-**Generated:** {datetime.now().strftime("%Y-%m-%d %H:%M:%S")}  
-**Source:** {self.json_file.name}
-
-## Overview
-
-This document describes the register map for the {reg_map["description"]}.
-
-- **Base Address:** {reg_map["base_address"]}
-- **Address Width:** {reg_map["address_width"]} bits
-- **Data Width:** {reg_map["data_width"]} bits
-- **Addressing:** {"Byte" if reg_map["byte_addressing"] else "Word"}
-
-## Register Summary
-
-| Address | Name | Access | Reset Value | Description |
-|---------|------|--------|-------------|-------------|
-'''
-        
-        # Generate register summary table
-        for reg in reg_map["registers"]:
-            doc_content += f"| {reg['address']} | {reg['name']} | {reg['access']} | {reg['reset_value']} | {reg['description']} |\n"
-        
-        doc_content += "\n## Register Detailed Descriptions\n\n"
-        
-        # Generate detailed descriptions
-        for reg in reg_map["registers"]:
-            doc_content += f"### {reg['name']} - {reg['description']}\n\n"
-            doc_content += f"**Address:** {reg['address']}  \n"
-            doc_content += f"**Reset Value:** {reg['reset_value']}  \n"
-            doc_content += f"**Access:** {reg['access']}  \n\n"
-            
-            if "fields" in reg and reg["fields"]:
-                doc_content += "| Bits | Field Name | Access | Reset | Description |\n"
-                doc_content += "|------|------------|--------|-------|-------------|\n"
-                
-                for field in reg["fields"]:
-                    doc_content += f"| {field['bits']} | {field['name']} | {field['access']} | {field['reset_value']} | {field['description']} |\n"
-            
-            doc_content += "\n"
-        
-        # Add access type definitions
-        doc_content += """## Access Type Definitions
-
-- **RO**: Read Only
-- **RW**: Read/Write
-- **WO**: Write Only  
-- **RW1C**: Read/Write 1 to Clear
-
-## Usage Examples
-
-### C Code Example
-
-```c
-#include "audio_codec_regs.h"
-
-// Read version register
-uint32_t version = AUDIO_CODEC_READ(base_addr, REG_VERSION);
-uint32_t major = REG_VERSION_MAJOR_VER_GET(version);
-
-// Configure sample rate
-AUDIO_CODEC_WRITE(base_addr, REG_SAMPLE_RATE, 48000);
-
-// Start encoding
-uint32_t ctrl = AUDIO_CODEC_READ(base_addr, REG_CONTROL);
-ctrl |= REG_CONTROL_MODE_SET(0x01) | REG_CONTROL_START_MASK;
-AUDIO_CODEC_WRITE(base_addr, REG_CONTROL, ctrl);
-```
-
-### Python Example
-
-```python
-# Register test
-from test_audio_codec_regs import AudioCodecRegisterTest
-
-test = AudioCodecRegisterTest()
-test.test_register_addresses()
-test.test_reset_values()
-```
-"""
-        
-        # Write to file
         output_file = self.output_dir / f"{reg_map['module_name']}_register_map.md"
-        with open(output_file, 'w') as f:
-            f.write(doc_content)
+        self._render("doc", output_file)
         
         print(f"Generated documentation: {output_file}")
 
@@ -497,6 +282,7 @@ def main():
     parser.add_argument("--sv-only", action="store_true", help="Generate SystemVerilog only")
     parser.add_argument("--c-only", action="store_true", help="Generate C header only")
     parser.add_argument("--doc-only", action="store_true", help="Generate documentation only")
+    parser.add_argument("--force", "-f", action="store_true", help="Regenerate even if outputs are up to date")
     
     args = parser.parse_args()
     
@@ -512,7 +298,7 @@ def main():
         elif args.doc_only:
             generator.generate_documentation()
         else:
-            generator.generate_all()
+            generator.generate_all(force=args.force)
             
     except Exception as e:
         print(f"Error: {e}", file=sys.stderr)
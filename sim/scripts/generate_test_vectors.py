@@ -10,17 +10,21 @@ LC3plus测试向量生成脚本 (LC3plus Test Vector Generator)
 
 import os
 import sys
+import json
 import subprocess
 import numpy as np
 import wave
-import struct
+import zlib
 import argparse
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from functools import cached_property
 from pathlib import Path
 
 class LC3plusTestVectorGenerator:
-    def __init__(self, reference_path="../LC3plus_ETSI_src_v17171_20200723"):
+    def __init__(self, reference_path="../LC3plus_ETSI_src_v17171_20200723", seed=None):
         """初始化测试向量生成器"""
         self.reference_path = Path(reference_path)
+        self._rng = np.random.default_rng(seed)
         self.test_vector_path = Path("../sim/test_vectors")
         self.reference_output_path = Path("../sim/reference")
         self.results_path = Path("../sim/results")
@@ -62,13 +66,78 @@ class LC3plusTestVectorGenerator:
             }
         ]
         
-    def build_reference_encoder(self):
-        """编译LC3plus参考编码器"""
-        print("正在编译LC3plus参考编码器...")
+    def _encoder_candidates(self):
+        """LC3plus编码器可能的输出路径"""
+        return [
+            self.reference_path / "build" / "lc3plus_encoder",
+            self.reference_path / "build" / "Release" / "lc3plus_encoder.exe",
+            self.reference_path / "build" / "lc3plus_encoder.exe",
+            self.reference_path / "cmake-build-debug" / "lc3plus_encoder.exe"
+        ]
+    
+    @cached_property
+    def encoder_path(self):
+        """已编译编码器的路径（首次访问时解析并缓存），找不到时为None"""
+        for path in self._encoder_candidates():
+            if path.exists():
+                return path
+        return None
+    
+    def _newest_source_mtime(self, build_dir):
+        """参考代码源文件（.c/.h/CMakeLists.txt）的最新修改时间，忽略构建目录
+        
+        单次遍历参考代码树，并且不进入构建目录，避免扫描大量构建产物
+        """
+        newest = 0
+        for root, dirs, files in os.walk(self.reference_path):
+            if root == str(self.reference_path):
+                dirs[:] = [d for d in dirs if d != build_dir.name]
+            for name in files:
+                if name.endswith(('.c', '.h')) or name == "CMakeLists.txt":
+                    newest = max(newest, os.stat(os.path.join(root, name)).st_mtime_ns)
+        return newest
+    
+    def _encoder_is_fresh(self, build_dir):
+        """已编译的编码器比所有源文件都新时返回True"""
+        # .build_stamp只记录上次找到的编码器路径，用于调整候选路径的检查顺序
+        stamp_file = build_dir / ".build_stamp"
+        candidates = self._encoder_candidates()
+        stamp = None
+        try:
+            stamp = json.loads(stamp_file.read_text())
+            candidates.insert(0, Path(stamp["encoder"]))
+        except (OSError, ValueError, KeyError, TypeError):
+            pass
         
+        for path in candidates:
+            if path.exists():
+                encoder_mtime = path.stat().st_mtime_ns
+                break
+        else:
+            return False
+        
+        if encoder_mtime <= self._newest_source_mtime(build_dir):
+            return False
+        
+        new_stamp = {"encoder": str(path)}
+        if stamp != new_stamp:
+            stamp_file.write_text(json.dumps(new_stamp))
+        return True
+    
+    def build_reference_encoder(self):
+        """编译LC3plus参考编码器（编码器已是最新时跳过cmake）"""
         build_dir = self.reference_path / "build"
         build_dir.mkdir(exist_ok=True)
         
+        if self._encoder_is_fresh(build_dir):
+            print("LC3plus参考编码器已是最新，跳过编译")
+            return True
+        
+        print("正在编译LC3plus参考编码器...")
+        
+        # 重新编译后编码器路径可能变化
+        self.__dict__.pop('encoder_path', None)
+        
         try:
             # 运行cmake配置
             subprocess.run([
@@ -91,53 +160,57 @@ class LC3plusTestVectorGenerator:
             print(f"编译失败: {e}")
             return False
     
-    def generate_test_audio(self, sample_rate, duration_sec, channels, frequency=1000):
-        """生成测试音频信号"""
+    def generate_test_audio(self, sample_rate, duration_sec, channels, frequency=1000, rng=None):
+        """生成测试音频信号（rng为None时使用生成器自身的随机数生成器）"""
         samples = int(sample_rate * duration_sec)
-        t = np.linspace(0, duration_sec, samples, False)
         
-        # 生成多频正弦波合成信号
-        audio = np.zeros((samples, channels))
+        # 生成多频正弦波合成信号：基频 + 3个谐波，每个通道频率偏移 ch*100Hz
+        harmonics = np.arange(1, 5)
+        amps = np.array([0.5, 0.3, 0.2, 0.1], dtype=np.float32)
+        freq_offsets = np.arange(channels) * 100
+        freqs = frequency * harmonics[:, None] + freq_offsets[None, :]  # (4, C)
+        omega = 2 * np.pi * freqs
         
-        for ch in range(channels):
-            # 每个通道使用不同的频率组合
-            freq_offset = ch * 100
-            
-            # 基频 + 谐波
-            signal = (
-                0.5 * np.sin(2 * np.pi * (frequency + freq_offset) * t) +
-                0.3 * np.sin(2 * np.pi * (frequency * 2 + freq_offset) * t) +
-                0.2 * np.sin(2 * np.pi * (frequency * 3 + freq_offset) * t) +
-                0.1 * np.sin(2 * np.pi * (frequency * 4 + freq_offset) * t)
-            )
-            
-            # 添加少量噪声使信号更真实
-            noise = np.random.normal(0, 0.01, samples)
-            signal += noise
-            
-            # 应用包络以避免突变
-            envelope = np.ones(samples)
-            fade_samples = int(0.01 * sample_rate)  # 10ms淡入淡出
-            envelope[:fade_samples] = np.linspace(0, 1, fade_samples)
-            envelope[-fade_samples:] = np.linspace(1, 0, fade_samples)
-            
-            signal *= envelope
-            audio[:, ch] = signal
+        # 合成信号严格周期，只对一个公共周期求sin（查表），再平铺到整个时长
+        # 相位用float64计算并折回[0, 2π)，sin及后续运算用float32（输出只有16位）
+        period = self._signal_period(sample_rate, freqs, samples)
+        t = np.arange(period) / sample_rate
+        phase = np.mod(omega[..., None] * t, 2 * np.pi).astype(np.float32)
+        one_period = np.einsum('h,hcn->nc', amps, np.sin(phase))
+        audio = np.tile(one_period, (-(-samples // period), 1))[:samples]
         
-        # 归一化到16位PCM范围
-        audio = np.clip(audio * 32767, -32768, 32767).astype(np.int16)
+        # 添加少量噪声使信号更真实
+        rng = rng if rng is not None else self._rng
+        noise = rng.standard_normal((samples, channels), dtype=np.float32)
+        audio += np.float32(0.01) * noise
+        
+        # 应用包络以避免突变，只处理首尾两段（所有通道共用，中间段恒为1）
+        fade_samples = int(0.01 * sample_rate)  # 10ms淡入淡出
+        fade_in = np.linspace(0, 1, fade_samples, dtype=np.float32)
+        audio[:fade_samples] *= fade_in[:, None]
+        audio[-fade_samples:] *= fade_in[::-1, None]
+        
+        # 归一化到16位PCM范围（原地缩放和限幅，不产生中间数组）
+        np.multiply(audio, 32767, out=audio)
+        np.clip(audio, -32768, 32767, out=audio)
+        audio = audio.astype(np.int16)
         
         return audio
     
+    @staticmethod
+    def _signal_period(sample_rate, freqs, samples):
+        """返回多频信号的公共周期（样本数），无法整除时退化为全长"""
+        if not float(sample_rate).is_integer() or not np.all(np.mod(freqs, 1) == 0):
+            return samples
+        g = np.gcd.reduce(np.append(freqs.astype(np.int64).ravel(), int(sample_rate)))
+        return max(1, min(int(sample_rate) // int(g), samples))
+    
     def save_pcm_file(self, audio_data, filename):
         """保存PCM文件"""
-        with open(filename, 'wb') as f:
-            for sample in audio_data:
-                if len(sample.shape) == 0:  # 单声道
-                    f.write(struct.pack('<h', int(sample)))
-                else:  # 多声道
-                    for ch_sample in sample:
-                        f.write(struct.pack('<h', int(ch_sample)))
+        # 交织的小端16位样本，整块一次写出
+        pcm = np.ascontiguousarray(audio_data).astype('<i2', copy=False)
+        with open(filename, 'wb', buffering=1 << 20) as f:
+            pcm.tofile(f)
     
     def save_wav_file(self, audio_data, filename, sample_rate):
         """保存WAV文件"""
@@ -149,24 +222,12 @@ class LC3plusTestVectorGenerator:
     
     def run_reference_encoder(self, input_wav, output_lc3, config):
         """运行LC3plus参考编码器"""
-        encoder_path = self.reference_path / "build" / "lc3plus_encoder"
+        encoder_path = self.encoder_path
         
         # 检查编码器是否存在
-        if not encoder_path.exists():
-            # 尝试其他可能的路径
-            encoder_paths = [
-                self.reference_path / "build" / "Release" / "lc3plus_encoder.exe",
-                self.reference_path / "build" / "lc3plus_encoder.exe",
-                self.reference_path / "cmake-build-debug" / "lc3plus_encoder.exe"
-            ]
-            
-            for path in encoder_paths:
-                if path.exists():
-                    encoder_path = path
-                    break
-            else:
-                print(f"找不到LC3plus编码器: {encoder_path}")
-                return False
+        if encoder_path is None:
+            print(f"找不到LC3plus编码器: {self._encoder_candidates()[0]}")
+            return False
         
         # 构建命令行参数
         cmd = [
@@ -196,8 +257,56 @@ class LC3plusTestVectorGenerator:
             print(f"编码异常: {e}")
             return False
     
-    def generate_all_test_vectors(self):
-        """生成所有测试配置的测试向量"""
+    def _process_one_config(self, index, total_count, config, save_raw=True):
+        """生成单个配置的测试音频并运行参考编码器，返回是否成功"""
+        print(f"\n=== 生成测试向量 {index+1}/{total_count}: {config['name']} ===")
+        
+        # 每个配置使用独立的随机数生成器，以配置名作种子保证可复现且线程安全
+        rng = np.random.default_rng(zlib.crc32(config['name'].encode()))
+        
+        # 生成测试音频 (5秒)
+        duration = 5.0  # 秒
+        audio_data = self.generate_test_audio(
+            config['sample_rate'], 
+            duration, 
+            config['channels'],
+            rng=rng
+        )
+        
+        # 文件名
+        pcm_file = self.test_vector_path / f"pcm_{config['name']}.raw"
+        wav_file = self.test_vector_path / f"pcm_{config['name']}.wav"
+        lc3_file = self.reference_output_path / f"ref_{config['name']}.lc3"
+        
+        # 保存PCM和WAV文件（两者共用同一份小端16位数据）
+        audio_data = np.ascontiguousarray(audio_data, dtype='<i2')
+        if save_raw:
+            self.save_pcm_file(audio_data, pcm_file)
+        self.save_wav_file(audio_data, wav_file, config['sample_rate'])
+        
+        print(f"生成音频文件: {wav_file}")
+        print(f"  采样率: {config['sample_rate']} Hz")
+        print(f"  时长: {duration} 秒")
+        print(f"  通道数: {config['channels']}")
+        print(f"  样本数: {len(audio_data)}")
+        
+        # 运行参考编码器
+        if not self.run_reference_encoder(wav_file, lc3_file, config):
+            print(f"配置 {config['name']} 编码失败")
+            return False
+        
+        print(f"参考比特流生成: {lc3_file}")
+        
+        # 验证输出文件
+        if lc3_file.exists():
+            file_size = lc3_file.stat().st_size
+            print(f"比特流文件大小: {file_size} 字节")
+        else:
+            print("警告: 比特流文件未生成")
+        return True
+    
+    def generate_all_test_vectors(self, max_workers=None, save_raw=True):
+        """生成所有测试配置的测试向量（save_raw=False时不生成.raw PCM文件）"""
         print("开始生成LC3plus测试向量...")
         
         # 首先编译参考编码器
@@ -205,59 +314,34 @@ class LC3plusTestVectorGenerator:
             print("无法编译参考编码器，退出")
             return False
         
+        # 在并行处理前解析一次编码器路径，各配置共用
+        self.encoder_path
+        
         success_count = 0
         total_count = len(self.test_configs)
         
-        for i, config in enumerate(self.test_configs):
-            print(f"\n=== 生成测试向量 {i+1}/{total_count}: {config['name']} ===")
-            
-            # 生成测试音频 (5秒)
-            duration = 5.0  # 秒
-            audio_data = self.generate_test_audio(
-                config['sample_rate'], 
-                duration, 
-                config['channels']
-            )
-            
-            # 文件名
-            pcm_file = self.test_vector_path / f"pcm_{config['name']}.raw"
-            wav_file = self.test_vector_path / f"pcm_{config['name']}.wav"
-            lc3_file = self.reference_output_path / f"ref_{config['name']}.lc3"
-            
-            # 保存PCM和WAV文件
-            self.save_pcm_file(audio_data, pcm_file)
-            self.save_wav_file(audio_data, wav_file, config['sample_rate'])
-            
-            print(f"生成音频文件: {wav_file}")
-            print(f"  采样率: {config['sample_rate']} Hz")
-            print(f"  时长: {duration} 秒")
-            print(f"  通道数: {config['channels']}")
-            print(f"  样本数: {len(audio_data)}")
-            
-            # 运行参考编码器
-            if self.run_reference_encoder(wav_file, lc3_file, config):
-                success_count += 1
-                print(f"参考比特流生成: {lc3_file}")
-                
-                # 验证输出文件
-                if lc3_file.exists():
-                    file_size = lc3_file.stat().st_size
-                    print(f"比特流文件大小: {file_size} 字节")
-                else:
-                    print("警告: 比特流文件未生成")
-            else:
-                print(f"配置 {config['name']} 编码失败")
+        # 各配置相互独立（音频合成 + 外部编码器进程），并行处理
+        workers = max_workers or total_count
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = [
+                executor.submit(self._process_one_config, i, total_count, config, save_raw)
+                for i, config in enumerate(self.test_configs)
+            ]
+            for future in as_completed(futures):
+                if future.result():
+                    success_count += 1
         
         print(f"\n=== 测试向量生成完成 ===")
         print(f"成功: {success_count}/{total_count}")
         
         # 生成测试向量清单
-        self.generate_test_manifest()
+        self.generate_test_manifest(save_raw)
         
         return success_count == total_count
     
-    def generate_test_manifest(self):
+    def generate_test_manifest(self, save_raw=True):
         """生成测试向量清单文件"""
+        pcm_ext = "raw" if save_raw else "wav"
         manifest_file = self.test_vector_path / "test_manifest.txt"
         
         with open(manifest_file, 'w') as f:
@@ -268,11 +352,11 @@ class LC3plusTestVectorGenerator:
             for config in self.test_configs:
                 f.write(f"{config['name']},{config['sample_rate']},{config['frame_duration']},")
                 f.write(f"{config['bitrate']},{config['channels']},")
-                f.write(f"pcm_{config['name']}.raw,ref_{config['name']}.lc3\n")
+                f.write(f"pcm_{config['name']}.{pcm_ext},ref_{config['name']}.lc3\n")
         
         print(f"测试清单生成: {manifest_file}")
     
-    def verify_test_vectors(self):
+    def verify_test_vectors(self, check_raw=True):
         """验证生成的测试向量"""
         print("\n验证测试向量...")
         
@@ -284,13 +368,14 @@ class LC3plusTestVectorGenerator:
             print(f"\n配置: {config['name']}")
             
             # 检查文件存在性
-            if pcm_file.exists():
-                size = pcm_file.stat().st_size
-                expected_samples = config['sample_rate'] * 5  # 5秒
-                expected_size = expected_samples * 2 * config['channels']  # 16位
-                print(f"  PCM文件: {size} 字节 (期望: {expected_size})")
-            else:
-                print(f"  PCM文件: 缺失")
+            if check_raw:
+                if pcm_file.exists():
+                    size = pcm_file.stat().st_size
+                    expected_samples = config['sample_rate'] * 5  # 5秒
+                    expected_size = expected_samples * 2 * config['channels']  # 16位
+                    print(f"  PCM文件: {size} 字节 (期望: {expected_size})")
+                else:
+                    print(f"  PCM文件: 缺失")
             
             if wav_file.exists():
                 print(f"  WAV文件: 存在")
@@ -310,17 +395,23 @@ def main():
                        help='LC3plus参考代码路径')
     parser.add_argument('--verify-only', action='store_true',
                        help='仅验证现有测试向量')
+    parser.add_argument('--no-raw', action='store_true',
+                       help='不生成.raw PCM文件（仅生成WAV）')
+    parser.add_argument('--jobs', '-j', type=int, default=None,
+                       help='并行处理的配置数（默认：配置总数）')
     
     args = parser.parse_args()
     
     generator = LC3plusTestVectorGenerator(args.reference_path)
     
+    save_raw = not args.no_raw
+    
     if args.verify_only:
-        generator.verify_test_vectors()
+        generator.verify_test_vectors(check_raw=save_raw)
     else:
-        if generator.generate_all_test_vectors():
+        if generator.generate_all_test_vectors(max_workers=args.jobs, save_raw=save_raw):
             print("\n所有测试向量生成成功!")
-            generator.verify_test_vectors()
+            generator.verify_test_vectors(check_raw=save_raw)
         else:
             print("\n测试向量生成失败!")
             sys.exit(1)
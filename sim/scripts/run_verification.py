@@ -13,27 +13,73 @@ import sys
 import subprocess
 import time
 import json
+import hashlib
+import shutil
+import threading
+from collections import deque
+from concurrent.futures import (FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor,
+                                as_completed, wait)
+from functools import lru_cache
 from pathlib import Path
 import argparse
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# 流式运行命令时内存中保留的输出行数
+_STREAM_TAIL_LINES = 200
+
+# 编译缓存保留的最近使用的条目数，更早的条目在写入新条目时删除
+_COMPILE_CACHE_KEEP = 4
+
+def _write_json(path, data):
+    """写JSON报告，优先用orjson序列化（UTF-8输出，缩进2）"""
+    if orjson is not None:
+        Path(path).write_bytes(orjson.dumps(data, option=orjson.OPT_INDENT_2))
+        return
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, indent=2, ensure_ascii=False)
+
 class LC3plusVerificationRunner:
-    def __init__(self):
-        """初始化验证运行器"""
+    def __init__(self, config_id=None):
+        """初始化验证运行器
+        
+        config_id: 配置标识，指定时结果写入results/<config_id>，便于多个配置并行验证
+        """
         self.project_root = Path(__file__).parent.parent.parent
         self.sim_path = self.project_root / "sim"
         self.rtl_path = self.project_root / "rtl"
         self.scripts_path = self.sim_path / "scripts"
         self.results_path = self.sim_path / "results"
+        self.config_id = config_id
+        if config_id:
+            self.results_path = self.results_path / config_id
         
         # 创建结果目录
         self.results_path.mkdir(parents=True, exist_ok=True)
         
+        # RTL文件列表与testbench文件
+        self._rtl_files = [
+            self.rtl_path / "processing" / "mdct_transform.v",
+            self.rtl_path / "processing" / "spectral_analysis.v",
+            self.rtl_path / "processing" / "quantization_control.v",
+            self.rtl_path / "processing" / "entropy_coding.v",
+            self.rtl_path / "processing" / "bitstream_packing.v",
+            self.rtl_path / "lc3plus_encoder_top.v"
+        ]
+        self._tb_file = self.sim_path / "testbench" / "tb_lc3plus_encoder_top.sv"
+        
+        # 调试模式下日志输出完整命令行
+        self._debug = False
+        
         # 仿真配置
         self.sim_config = {
             'simulator': 'iverilog',  # 或 'modelsim', 'questasim'
             'top_module': 'tb_lc3plus_encoder_top',
             'timeout': 3600,  # 1小时超时
-            'wave_dump': True
+            'wave_dump': False  # 波形文件很大，按需用--waves开启
         }
         
         # 验证步骤
@@ -45,19 +91,46 @@ class LC3plusVerificationRunner:
             'generate_report'
         ]
         
+        # 步骤依赖关系，互不依赖的步骤并行执行
+        self.step_deps = {
+            'generate_test_vectors': [],
+            'compile_rtl': [],
+            'run_simulation': ['generate_test_vectors', 'compile_rtl'],
+            'analyze_results': ['run_simulation'],
+            'generate_report': ['analyze_results']
+        }
+        
         self.step_results = {}
+        self._log_lock = threading.Lock()
+    
+    @staticmethod
+    @lru_cache(maxsize=4)
+    def _ts(sec):
+        """格式化时间戳（按秒缓存，同一秒内的日志不重复格式化）"""
+        return time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(sec))
     
     def log(self, message, level='INFO'):
         """日志输出"""
-        timestamp = time.strftime('%Y-%m-%d %H:%M:%S')
-        print(f"[{timestamp}] [{level}] {message}")
+        timestamp = self._ts(int(time.time()))
+        with self._log_lock:
+            print(f"[{timestamp}] [{level}] {message}")
     
-    def run_command(self, cmd, cwd=None, timeout=None):
-        """运行系统命令"""
+    def run_command(self, cmd, cwd=None, timeout=None, stream_to=None):
+        """运行系统命令
+        
+        指定stream_to时输出(stdout与stderr合并)边运行边写入该文件，
+        内存中只保留末尾若干行作为返回的stdout
+        """
         if cwd is None:
             cwd = self.project_root
         
-        self.log(f"执行命令: {' '.join(cmd) if isinstance(cmd, list) else cmd}")
+        if self._debug:
+            self.log(f"执行命令: {' '.join(cmd) if isinstance(cmd, list) else cmd}")
+        else:
+            self.log(f"执行命令: {cmd[0] if isinstance(cmd, list) else cmd}")
+        
+        if stream_to is not None:
+            return self._run_streaming(cmd, cwd, timeout or 300, stream_to)
         
         try:
             result = subprocess.run(
@@ -82,6 +155,42 @@ class LC3plusVerificationRunner:
             self.log(f"命令执行异常: {e}", "ERROR")
             return False, "", str(e)
     
+    def _run_streaming(self, cmd, cwd, timeout, stream_to):
+        """流式运行命令，输出逐行写入文件"""
+        timed_out = threading.Event()
+        tail = deque(maxlen=_STREAM_TAIL_LINES)
+        
+        try:
+            with open(stream_to, 'w') as log_f, subprocess.Popen(
+                    cmd, cwd=cwd, stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+                    text=True, bufsize=1) as proc:
+                def _kill():
+                    timed_out.set()
+                    proc.kill()
+                
+                timer = threading.Timer(timeout, _kill)
+                timer.start()
+                try:
+                    for line in proc.stdout:
+                        log_f.write(line)
+                        tail.append(line)
+                    returncode = proc.wait()
+                finally:
+                    timer.cancel()
+        except Exception as e:
+            self.log(f"命令执行异常: {e}", "ERROR")
+            return False, "".join(tail), str(e)
+        
+        output = "".join(tail)
+        if timed_out.is_set():
+            self.log("命令执行超时", "ERROR")
+            return False, output, "Timeout"
+        if returncode == 0:
+            self.log("命令执行成功")
+            return True, output, ""
+        self.log(f"命令执行失败: {output}", "ERROR")
+        return False, output, output
+    
     def step_generate_test_vectors(self):
         """步骤1: 生成测试向量"""
         self.log("=== 步骤1: 生成测试向量 ===")
@@ -116,21 +225,12 @@ class LC3plusVerificationRunner:
         """步骤2: 编译RTL代码"""
         self.log("=== 步骤2: 编译RTL代码 ===")
         
-        # RTL文件列表
-        rtl_files = [
-            self.rtl_path / "processing" / "mdct_transform.v",
-            self.rtl_path / "processing" / "spectral_analysis.v",
-            self.rtl_path / "processing" / "quantization_control.v",
-            self.rtl_path / "processing" / "entropy_coding.v",
-            self.rtl_path / "processing" / "bitstream_packing.v",
-            self.rtl_path / "lc3plus_encoder_top.v"
-        ]
+        rtl_files = self._rtl_files
+        tb_file = self._tb_file
         
-        # 检查文件存在性
-        missing_files = []
-        for file in rtl_files:
-            if not file.exists():
-                missing_files.append(str(file))
+        # 检查文件存在性（每个目录只读一次）
+        missing = self._missing_files(rtl_files + [tb_file])
+        missing_files = [str(f) for f in missing if f != tb_file]
         
         if missing_files:
             self.log(f"缺少RTL文件: {missing_files}", "ERROR")
@@ -140,9 +240,7 @@ class LC3plusVerificationRunner:
             }
             return False
         
-        # testbench文件
-        tb_file = self.sim_path / "testbench" / "tb_lc3plus_encoder_top.sv"
-        if not tb_file.exists():
+        if tb_file in missing:
             self.log("测试平台文件不存在", "ERROR")
             self.step_results['compile_rtl'] = {
                 'status': 'FAIL',
@@ -150,14 +248,31 @@ class LC3plusVerificationRunner:
             }
             return False
         
+        # 源文件未变化时直接复用已编译的仿真文件
+        cache_dir = self.results_path / '.compile_cache' / self._compile_cache_key([tb_file] + rtl_files)
+        cached_sim = cache_dir / 'simulation'
+        if cached_sim.is_file():
+            # 更新目录时间戳，记录最近使用时间
+            os.utime(cache_dir)
+            self._install_simulation(cached_sim)
+            self.log("RTL源文件未变化，复用编译缓存")
+            self.step_results['compile_rtl'] = {
+                'status': 'PASS',
+                'details': 'cache hit'
+            }
+            return True
+        
         # 编译命令
         if self.sim_config['simulator'] == 'iverilog':
+            # 仿真文件可能是缓存的硬链接，先删除避免编译时覆盖缓存内容
+            (self.results_path / 'simulation').unlink(missing_ok=True)
             compile_cmd = [
                 'iverilog',
                 '-g2012',  # SystemVerilog 2012
                 '-o', str(self.results_path / 'simulation'),
                 str(tb_file)
             ] + [str(f) for f in rtl_files]
+            success, _, stderr = self.run_command(compile_cmd)
             
         elif self.sim_config['simulator'] == 'modelsim':
             # ModelSim编译流程
@@ -167,10 +282,12 @@ class LC3plusVerificationRunner:
             self.log(f"不支持的仿真器: {self.sim_config['simulator']}", "ERROR")
             return False
         
-        success, stdout, stderr = self.run_command(compile_cmd)
-        
         if success:
             self.log("RTL代码编译成功")
+            cache_dir.mkdir(parents=True, exist_ok=True)
+            os.replace(self.results_path / 'simulation', cached_sim)
+            self._install_simulation(cached_sim)
+            self._prune_compile_cache(cache_dir.parent)
             self.step_results['compile_rtl'] = {
                 'status': 'PASS',
                 'details': 'RTL compilation successful'
@@ -184,6 +301,56 @@ class LC3plusVerificationRunner:
             }
             return False
     
+    def _missing_files(self, paths):
+        """批量检查文件是否存在：每个父目录只调用一次os.scandir"""
+        dir_entries = {}
+        for parent in {p.parent for p in paths}:
+            try:
+                with os.scandir(parent) as it:
+                    dir_entries[parent] = {entry.name for entry in it if entry.is_file()}
+            except OSError:
+                dir_entries[parent] = set()
+        return [p for p in paths if p.name not in dir_entries[p.parent]]
+    
+    def _compile_cache_key(self, sources):
+        """根据仿真器和源文件路径、内容计算编译缓存键"""
+        digest = hashlib.blake2b(digest_size=16)
+        digest.update(self.sim_config['simulator'].encode())
+        for src in sources:
+            data = src.read_bytes()
+            digest.update(f"\0{src}\0{len(data)}\0".encode())
+            digest.update(data)
+        return digest.hexdigest()
+    
+    def _prune_compile_cache(self, cache_root):
+        """只保留最近使用的_COMPILE_CACHE_KEEP个编译缓存条目"""
+        try:
+            with os.scandir(cache_root) as it:
+                entries = [(entry.stat().st_mtime_ns, entry.path)
+                           for entry in it if entry.is_dir(follow_symlinks=False)]
+        except OSError:
+            return
+        entries.sort(reverse=True)
+        for _, path in entries[_COMPILE_CACHE_KEEP:]:
+            shutil.rmtree(path, ignore_errors=True)
+    
+    def _install_simulation(self, cached_sim):
+        """把缓存的仿真文件放到results/simulation（优先硬链接）"""
+        target = self.results_path / 'simulation'
+        tmp = self.results_path / 'simulation.tmp'
+        tmp.unlink(missing_ok=True)
+        # 已是同一文件的硬链接时无需替换（同一inode间rename不会删除tmp）
+        try:
+            if os.path.samefile(cached_sim, target):
+                return
+        except OSError:
+            pass
+        try:
+            os.link(cached_sim, tmp)
+        except OSError:
+            shutil.copy2(cached_sim, tmp)
+        os.replace(tmp, target)
+    
     def step_run_simulation(self):
         """步骤3: 运行仿真"""
         self.log("=== 步骤3: 运行仿真 ===")
@@ -197,33 +364,25 @@ class LC3plusVerificationRunner:
             }
             return False
         
-        # 设置仿真环境变量
-        sim_env = os.environ.copy()
-        if self.sim_config['wave_dump']:
-            sim_env['VCD_FILE'] = str(self.results_path / 'simulation.vcd')
-        
-        # 运行仿真
+        # 运行仿真，需要波形时通过+dump让testbench转储VCD
         sim_cmd = [str(sim_executable)]
+        if self.sim_config['wave_dump']:
+            sim_cmd.append('+dump')
         
         self.log("开始运行仿真...")
         start_time = time.time()
         
+        # 仿真输出边运行边写入simulation.log
         success, stdout, stderr = self.run_command(
             sim_cmd, 
             cwd=self.results_path,
-            timeout=self.sim_config['timeout']
+            timeout=self.sim_config['timeout'],
+            stream_to=self.results_path / 'simulation.log'
         )
         
         end_time = time.time()
         sim_time = end_time - start_time
         
-        # 保存仿真输出
-        with open(self.results_path / 'simulation.log', 'w') as f:
-            f.write("=== STDOUT ===\n")
-            f.write(stdout)
-            f.write("\n=== STDERR ===\n")
-            f.write(stderr)
-        
         if success:
             self.log(f"仿真完成，耗时: {sim_time:.2f} 秒")
             self.step_results['run_simulation'] = {
@@ -286,37 +445,44 @@ class LC3plusVerificationRunner:
         }
         
         try:
-            with open(log_file, 'r') as f:
-                content = f.read()
+            # 逐行流式读取，内存占用与日志大小无关
+            with open(log_file, 'r', errors='replace') as f:
+                passed_frames = failed_frames = 0
+                for line in f:
+                    # 帧结果行占绝大多数，先判断并直接计数
+                    if '帧' in line:
+                        if 'PASS' in line:
+                            passed_frames += 1
+                            continue
+                        if 'FAIL' in line:
+                            failed_frames += 1
+                            continue
+                    
+                    # 查找关键信息
+                    if 'ERROR' in line:
+                        results['errors'].append(line.strip())
+                    elif 'WARNING' in line or 'Warning' in line:
+                        results['warnings'].append(line.strip())
+                    elif '总测试帧数:' in line:
+                        try:
+                            results['total_frames'] = int(line.split(':')[1].strip())
+                        except:
+                            pass
+                    elif '通过率:' in line:
+                        try:
+                            rate_str = line.split(':')[1].strip().replace('%', '')
+                            results['pass_rate'] = float(rate_str)
+                        except:
+                            pass
+                    elif '平均SNR:' in line:
+                        try:
+                            snr_str = line.split(':')[1].strip().replace('dB', '')
+                            results['avg_snr'] = float(snr_str)
+                        except:
+                            pass
             
-            # 查找关键信息
-            lines = content.split('\n')
-            for line in lines:
-                if 'PASS' in line and '帧' in line:
-                    results['passed_frames'] += 1
-                elif 'FAIL' in line and '帧' in line:
-                    results['failed_frames'] += 1
-                elif 'ERROR' in line:
-                    results['errors'].append(line.strip())
-                elif 'WARNING' in line or 'Warning' in line:
-                    results['warnings'].append(line.strip())
-                elif '总测试帧数:' in line:
-                    try:
-                        results['total_frames'] = int(line.split(':')[1].strip())
-                    except:
-                        pass
-                elif '通过率:' in line:
-                    try:
-                        rate_str = line.split(':')[1].strip().replace('%', '')
-                        results['pass_rate'] = float(rate_str)
-                    except:
-                        pass
-                elif '平均SNR:' in line:
-                    try:
-                        snr_str = line.split(':')[1].strip().replace('dB', '')
-                        results['avg_snr'] = float(snr_str)
-                    except:
-                        pass
+            results['passed_frames'] = passed_frames
+            results['failed_frames'] = failed_frames
             
             # 计算通过率(如果没有在日志中找到)
             if results['total_frames'] == 0:
@@ -347,8 +513,7 @@ class LC3plusVerificationRunner:
         
         # 生成JSON报告
         json_report = self.results_path / 'verification_report.json'
-        with open(json_report, 'w', encoding='utf-8') as f:
-            json.dump(report_data, f, indent=2, ensure_ascii=False)
+        _write_json(json_report, report_data)
         
         # 生成文本报告
         text_report = self.results_path / 'verification_report.txt'
@@ -412,8 +577,11 @@ class LC3plusVerificationRunner:
             'failed_steps': total_steps - passed_steps
         }
     
-    def run_verification(self, steps=None):
-        """运行完整验证流程"""
+    def run_verification(self, steps=None, resume=False):
+        """运行完整验证流程
+        
+        resume: 为True时跳过上次运行(step_results.json)中已通过的步骤
+        """
         if steps is None:
             steps = self.verification_steps
         
@@ -422,15 +590,50 @@ class LC3plusVerificationRunner:
         
         start_time = time.time()
         
+        pending = []
         for step in steps:
-            step_method = getattr(self, f'step_{step}', None)
-            if step_method is None:
+            if getattr(self, f'step_{step}', None) is None:
                 self.log(f"未知验证步骤: {step}", "ERROR")
-                continue
-            
-            if not step_method():
-                self.log(f"步骤 {step} 失败，停止验证", "ERROR")
-                break
+            else:
+                pending.append(step)
+        
+        done = set()
+        if resume:
+            for step, result in self._load_step_results().items():
+                if step in pending and result.get('status') == 'PASS':
+                    self.log(f"跳过步骤 {step}: 上次运行已通过")
+                    self.step_results[step] = result
+                    pending.remove(step)
+                    done.add(step)
+        
+        # 依赖全部通过的步骤立即提交，任一步骤失败后不再提交新步骤
+        running = {}
+        failed = False
+        with ThreadPoolExecutor(max_workers=max(len(pending), 1)) as executor:
+            while pending:
+                if not failed:
+                    for step in list(pending):
+                        deps = [d for d in self.step_deps.get(step, []) if d in steps]
+                        if all(d in done for d in deps):
+                            pending.remove(step)
+                            running[executor.submit(getattr(self, f'step_{step}'))] = step
+                if not running:
+                    break
+                
+                finished, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    step = running.pop(future)
+                    if future.result():
+                        done.add(step)
+                    else:
+                        self.log(f"步骤 {step} 失败，停止验证", "ERROR")
+                        failed = True
+                self._save_step_results()
+                
+                if not running:
+                    self._order_step_results(steps)
+        
+        self._order_step_results(steps)
         
         end_time = time.time()
         total_time = end_time - start_time
@@ -442,6 +645,28 @@ class LC3plusVerificationRunner:
         
         return self.get_overall_status()['status'] == 'PASS'
     
+    def _load_step_results(self):
+        """读取上次运行保存的步骤结果"""
+        state_file = self.results_path / 'step_results.json'
+        try:
+            return json.loads(state_file.read_bytes())
+        except (OSError, ValueError):
+            return {}
+    
+    def _save_step_results(self):
+        """保存当前步骤结果（先写临时文件再替换，中途崩溃不会留下半个文件）"""
+        state_file = self.results_path / 'step_results.json'
+        tmp_file = self.results_path / 'step_results.json.tmp'
+        _write_json(tmp_file, self.step_results.copy())
+        os.replace(tmp_file, state_file)
+    
+    def _order_step_results(self, steps):
+        """按步骤顺序整理结果（并行完成顺序不固定）"""
+        ordered = {step: self.step_results[step] for step in steps if step in self.step_results}
+        ordered.update(self.step_results)
+        self.step_results.clear()
+        self.step_results.update(ordered)
+    
     def print_summary(self):
         """打印验证结果摘要"""
         print("\n" + "=" * 60)
@@ -461,6 +686,62 @@ class LC3plusVerificationRunner:
         else:
             print("\n❌ 验证失败，请检查报告了解详情。")
 
+def _run_sweep_config(config, sim_config, steps, resume, debug=False):
+    """在子进程中运行单个配置的完整验证流程"""
+    runner = LC3plusVerificationRunner(config['config_id'])
+    runner._debug = debug
+    runner.sim_config.update(sim_config)
+    runner.sim_config.update(config.get('sim_config', {}))
+    success = runner.run_verification(steps, resume)
+    return config['config_id'], success, runner.step_results
+
+def run_verification_sweep(configs, parallelism=None, steps=None, sim_config=None, resume=False,
+                           debug=False):
+    """并行运行多个配置的验证流程
+    
+    configs: 配置列表，每项包含config_id和可选的sim_config覆盖项
+    测试向量各配置共用，只在开始时生成一次
+    """
+    main_runner = LC3plusVerificationRunner()
+    main_runner._debug = debug
+    if steps is None:
+        steps = main_runner.verification_steps
+    sim_config = sim_config or {}
+    parallelism = parallelism or max(1, (os.cpu_count() or 2) // 2)
+    
+    if 'generate_test_vectors' in steps:
+        if not main_runner.step_generate_test_vectors():
+            main_runner.log("测试向量生成失败，停止配置扫描", "ERROR")
+            return False
+        steps = [step for step in steps if step != 'generate_test_vectors']
+    
+    main_runner.log(f"并行验证 {len(configs)} 个配置，并行度: {parallelism}")
+    sweep_results = {}
+    with ProcessPoolExecutor(max_workers=min(parallelism, len(configs)) or 1) as executor:
+        futures = [executor.submit(_run_sweep_config, config, sim_config, steps, resume, debug)
+                   for config in configs]
+        for future in as_completed(futures):
+            config_id, success, step_results = future.result()
+            sweep_results[config_id] = {
+                'status': 'PASS' if success else 'FAIL',
+                'step_results': step_results
+            }
+    
+    # 按配置顺序汇总
+    sweep_results = {config['config_id']: sweep_results[config['config_id']] for config in configs}
+    sweep_report = main_runner.results_path / 'sweep_report.json'
+    _write_json(sweep_report, sweep_results)
+    main_runner.log(f"配置扫描报告生成: {sweep_report}")
+    
+    print("\n" + "=" * 60)
+    print("配置扫描结果")
+    print("=" * 60)
+    for config_id, result in sweep_results.items():
+        status_icon = "✅" if result['status'] == 'PASS' else "❌"
+        print(f"{status_icon} {config_id}: {result['status']}")
+    
+    return all(result['status'] == 'PASS' for result in sweep_results.values())
+
 def main():
     parser = argparse.ArgumentParser(description='LC3plus编码器验证运行器')
     parser.add_argument('--steps', nargs='+', 
@@ -471,9 +752,29 @@ def main():
                        default='iverilog', help='指定仿真器')
     parser.add_argument('--timeout', type=int, default=3600,
                        help='仿真超时时间(秒)')
+    parser.add_argument('--waves', action='store_true',
+                       help='转储VCD波形(仿真显著变慢)')
+    parser.add_argument('--sweep', type=Path,
+                       help='配置列表JSON文件，每项包含config_id和可选的sim_config')
+    parser.add_argument('--parallel', type=int,
+                       help='配置扫描的并行度(默认CPU核数的一半)')
+    parser.add_argument('--resume', action='store_true',
+                       help='跳过上次运行中已通过的步骤')
+    parser.add_argument('--debug', action='store_true',
+                       help='日志中输出完整命令行')
     
     args = parser.parse_args()
     
+    if args.sweep:
+        with open(args.sweep, 'r', encoding='utf-8') as f:
+            configs = json.load(f)
+        success = run_verification_sweep(
+            configs, args.parallel, args.steps,
+            {'simulator': args.simulator, 'timeout': args.timeout, 'wave_dump': args.waves},
+            args.resume, args.debug
+        )
+        sys.exit(0 if success else 1)
+    
     runner = LC3plusVerificationRunner()
     
     # 更新配置
@@ -481,9 +782,11 @@ def main():
         runner.sim_config['simulator'] = args.simulator
     if args.timeout:
         runner.sim_config['timeout'] = args.timeout
+    runner.sim_config['wave_dump'] = args.waves
+    runner._debug = args.debug
     
     # 运行验证
-    success = runner.run_verification(args.steps)
+    success = runner.run_verification(args.steps, args.resume)
     
     sys.exit(0 if success else 1)
 
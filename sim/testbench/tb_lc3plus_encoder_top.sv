@@ -708,4 +708,12 @@ always @(posedge clk) begin
     end
 end
 
+// 波形转储（仅在+dump时开启）
+initial begin
+    if ($test$plusargs("dump")) begin
+        $dumpfile("tb_lc3plus_encoder_top.vcd");
+        $dumpvars(0, tb_lc3plus_encoder_top);
+    end
+end
+
 endmodule 
\ No newline at end of file
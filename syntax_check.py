@@ -9,32 +9,81 @@ Verilog语法检查工具
 
 import re
 import os
+import mmap
+from bisect import bisect_right
+from functools import lru_cache
+from multiprocessing import Pool
 from pathlib import Path
 
-def check_task_calls(content, filename):
+# 所有模式直接作用于文件字节（mmap），不做整文件解码。
+# UTF-8和GB2312的多字节字符各字节均>=0x80，不会误匹配ASCII关键字和标识符。
+
+# 单次扫描的合并模式：零宽前瞻保证各类匹配互不吞并，
+# 配合按类别记录的上次匹配结束位置，结果与分别findall完全一致
+_MASTER_RE = re.compile(
+    rb'(?=(?P<task>task\s+(\w+))'
+    rb'|(?P<brk>\bbreak\s*;)'
+    rb'|(?P<inp>input\s+(?:\[[\d:]+\])?\s*(\w+))'
+    rb'|(?P<out>output\s+(?:\[[\d:]+\])?\s*(\w+))'
+    rb'|(?P<fn>function\s+(?:\[[\d:]+\])?\s*(\w+)))'
+)
+
+# 与文本模式读取一致，\r\n和单独的\r也算换行
+_NEWLINE_RE = re.compile(rb'\r\n?|\n')
+_NON_ASCII_RE = re.compile(rb'[\x80-\xff]')
+
+@lru_cache(maxsize=64)
+def _task_call_re(task_names):
+    """按任务名集合编译空括号调用模式（多个文件定义相同任务时复用）"""
+    return re.compile((r'(?=(' + '|'.join(task_names) + r')\s*\(\s*\)\s*;)').encode('ascii'))
+
+def scan_content(content):
+    """单次扫描文件内容(bytes)，收集任务、break、端口和函数定义"""
+    scan = {'task': [], 'brk': [], 'inp': [], 'out': [], 'fn': []}
+    last_end = dict.fromkeys(scan, 0)
+    
+    for match in _MASTER_RE.finditer(content):
+        kind = match.lastgroup
+        begin = match.start(kind)
+        if begin < last_end[kind]:
+            continue
+        last_end[kind] = match.end(kind)
+        if kind == 'brk':
+            scan['brk'].append(begin)
+        else:
+            scan[kind].append(match.group(match.lastindex + 1).decode('ascii'))
+    
+    return scan
+
+def check_task_calls(content, scan, filename):
     """检查任务调用语法"""
     errors = []
     warnings = []
     
-    # 查找任务定义
-    task_definitions = re.findall(r'task\s+(\w+)', content)
+    # 任务定义
+    task_definitions = scan['task']
+    if not task_definitions:
+        return errors, warnings
     
-    # 查找任务调用 - 检查是否有空括号
+    # 一次查找所有带空括号的任务调用
+    call_re = _task_call_re(tuple(sorted(set(task_definitions))))
+    called = {match.group(1).decode('ascii') for match in call_re.finditer(content)}
     for task_name in task_definitions:
-        # 查找带空括号的任务调用
-        empty_parens_calls = re.findall(fr'{task_name}\s*\(\s*\)\s*;', content)
-        if empty_parens_calls:
+        if task_name in called:
             errors.append(f"任务 '{task_name}' 使用了空括号调用，应该使用无括号调用")
     
     return errors, warnings
 
-def check_break_statements(content, filename):
+def check_break_statements(content, scan, filename):
     """检查break语句（iverilog不支持）"""
     errors = []
+    if not scan['brk']:
+        return errors
     
-    break_matches = re.finditer(r'\bbreak\s*;', content)
-    for match in break_matches:
-        line_num = content[:match.start()].count('\n') + 1
+    # 换行位置只计算一次，行号用二分查找
+    newlines = [match.start() for match in _NEWLINE_RE.finditer(content)]
+    for pos in scan['brk']:
+        line_num = bisect_right(newlines, pos) + 1
         errors.append(f"第{line_num}行: 使用了break语句，iverilog不支持")
     
     return errors
@@ -43,58 +92,70 @@ def check_timescale(content, filename):
     """检查timescale指令"""
     warnings = []
     
-    if '`timescale' not in content:
+    if content.find(b'`timescale') == -1:
         warnings.append(f"缺少timescale指令")
     
     return warnings
 
-def check_function_conflicts(content, filename):
+def check_function_conflicts(scan, filename):
     """检查函数名与端口名冲突"""
     errors = []
     
-    # 查找端口声明
-    input_ports = re.findall(r'input\s+(?:\[[\d:]+\])?\s*(\w+)', content)
-    output_ports = re.findall(r'output\s+(?:\[[\d:]+\])?\s*(\w+)', content)
-    all_ports = set(input_ports + output_ports)
-    
-    # 查找函数定义
-    functions = re.findall(r'function\s+(?:\[[\d:]+\])?\s*(\w+)', content)
+    # 端口声明
+    all_ports = set(scan['inp']) | set(scan['out'])
     
     # 检查冲突
-    for func in functions:
+    for func in scan['fn']:
         if func in all_ports:
             errors.append(f"函数 '{func}' 与端口名冲突")
     
     return errors
 
-def check_file(filepath):
-    """检查单个文件"""
+def _decode_error(content):
+    """确认文件可按UTF-8或GB2312解码，纯ASCII文件直接通过；不可解码时返回异常"""
+    if not _NON_ASCII_RE.search(content):
+        return None
+    data = bytes(content)
     try:
-        with open(filepath, 'r', encoding='utf-8') as f:
-            content = f.read()
+        data.decode('utf-8')
     except UnicodeDecodeError:
         try:
-            with open(filepath, 'r', encoding='gb2312') as f:
-                content = f.read()
+            data.decode('gb2312')
         except Exception as e:
-            return [f"无法读取文件: {e}"], []
+            return e
+    return None
+
+def check_file(filepath):
+    """检查单个文件（只读映射，避免整文件读入并解码）"""
+    with open(filepath, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return check_content(b'', filepath)
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as content:
+            return check_content(content, filepath)
+
+def check_content(content, filepath):
+    """对文件字节内容执行各项检查"""
+    error = _decode_error(content)
+    if error is not None:
+        return [f"无法读取文件: {error}"], []
     
     filename = Path(filepath).name
     errors = []
     warnings = []
     
-    # 执行各项检查
-    task_errors, task_warnings = check_task_calls(content, filename)
+    # 执行各项检查（共用一次扫描结果）
+    scan = scan_content(content)
+    task_errors, task_warnings = check_task_calls(content, scan, filename)
     errors.extend(task_errors)
     warnings.extend(task_warnings)
     
-    break_errors = check_break_statements(content, filename)
+    break_errors = check_break_statements(content, scan, filename)
     errors.extend(break_errors)
     
     timescale_warnings = check_timescale(content, filename)
     warnings.extend(timescale_warnings)
     
-    function_errors = check_function_conflicts(content, filename)
+    function_errors = check_function_conflicts(scan, filename)
     errors.extend(function_errors)
     
     return errors, warnings
@@ -117,13 +178,20 @@ def main():
     total_errors = 0
     total_warnings = 0
     
+    # 各文件检查相互独立，并行执行后按原顺序输出
+    existing_files = [f for f in files_to_check if os.path.exists(f)]
+    results = {}
+    if existing_files:
+        with Pool(processes=min(len(existing_files), os.cpu_count() or 1)) as pool:
+            results = dict(zip(existing_files, pool.map(check_file, existing_files)))
+    
     for filepath in files_to_check:
-        if not os.path.exists(filepath):
+        if filepath not in results:
             print(f"⚠️ 文件不存在: {filepath}")
             continue
             
         print(f"\n📄 检查文件: {Path(filepath).name}")
-        errors, warnings = check_file(filepath)
+        errors, warnings = results[filepath]
         
         if errors:
             print(f"❌ 发现 {len(errors)} 个错误:")
@@ -15,17 +15,113 @@ LC3plus编码器RTL代码验证脚本
 日期：2024-06-11
 """
 
+import argparse
+import hashlib
+import io
+import json
 import os
-import re
 import sys
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
-from typing import Dict, List, Tuple, Set
+from typing import Dict, List, NamedTuple, Tuple, Set
+
+import _rtl_patterns
+from _rtl_patterns import TIMESCALE_TOKEN, count_newlines, open_source, scan_module
+
+# 解析结果缓存文件（位于项目根目录），按(mtime, size)判断文件是否修改
+CACHE_FILE_NAME = '.rtl_verify_cache.json'
+
+# 文件数达到该阈值才启用进程池，文件较少时进程启动开销大于解析本身
+_PARALLEL_MIN_FILES = 32
+
+class ModuleInfo(NamedTuple):
+    """单个模块的解析结果"""
+    name: str
+    file: str
+    file_basename: str
+    inputs: List[str]
+    outputs: List[str]
+    inouts: List[str]
+    parameters: List[str]
+    line_count: int
+    has_timescale: bool
+    has_clk: bool
+    has_rst: bool
+    inputs_lc: str  # 输入端口名以'|'拼接后的小写形式，供信号名子串检查复用
+
+def _parse_module_file(file_path: Path) -> Tuple[ModuleInfo, List[str]]:
+    """解析单个Verilog模块，返回(模块信息, 错误列表)；模块级函数便于进程池调用"""
+    errors = []
+    
+    # 直接按字节匹配（大文件经mmap映射）；标识符均为ASCII，无需按UTF-8/GB2312解码整个文件
+    with open_source(file_path) as content:
+        # 直接统计换行符，不构造行列表；末行无换行符时补1，空文件为0
+        line_count = count_newlines(content) + (0 if not content or content[-1:] == b'\n' else 1)
+        
+        # 检查时间尺度
+        has_timescale = content.find(TIMESCALE_TOKEN) != -1
+        
+        # 一次扫描得到模块声明、端口和参数
+        found = scan_module(content)
+    
+    # 查找模块声明
+    if not found['module']:
+        errors.append(f"在文件 {file_path} 中未找到模块声明")
+        return ModuleInfo('', str(file_path), file_path.name, [], [], [], [], line_count, has_timescale, False, False, ''), errors
+    
+    # 检查时钟和复位信号（端口名拼接后整体小写一次；'|'不会出现在标识符中）
+    inputs_lc = '|'.join(found['inputs']).lower()
+    
+    module_info = ModuleInfo(
+        name=found['module'][0],
+        file=str(file_path),
+        file_basename=file_path.name,
+        inputs=found['inputs'],
+        outputs=found['outputs'],
+        inouts=found['inouts'],
+        parameters=found['parameters'],
+        line_count=line_count,
+        has_timescale=has_timescale,
+        has_clk='clk' in inputs_lc,
+        has_rst='rst' in inputs_lc,
+        inputs_lc=inputs_lc
+    )
+    
+    return module_info, errors
+
+def _cache_version() -> str:
+    """以脚本自身及共用正则模块的哈希作为缓存版本，解析逻辑修改后旧缓存自动失效"""
+    digest = hashlib.blake2b(Path(__file__).read_bytes(), digest_size=16)
+    digest.update(Path(_rtl_patterns.__file__).read_bytes())
+    return digest.hexdigest()
+
+def _load_parse_cache(cache_file: Path) -> Dict[str, Dict]:
+    """加载解析结果缓存，文件缺失、损坏或版本不符时返回空字典"""
+    try:
+        with open(cache_file, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    
+    if not isinstance(data, dict) or data.get('version') != _cache_version():
+        return {}
+    return data.get('entries', {})
+
+def _save_parse_cache(cache_file: Path, entries: Dict[str, Dict]):
+    """保存解析结果缓存"""
+    try:
+        with open(cache_file, 'w', encoding='utf-8') as f:
+            json.dump({'version': _cache_version(), 'entries': entries}, f, ensure_ascii=False)
+    except OSError as e:
+        print(f"⚠️ 无法写入缓存文件 {cache_file} - {e}")
 
 class RTLVerifier:
     """RTL代码验证器"""
     
-    def __init__(self, project_root: str):
+    def __init__(self, project_root: str, use_cache: bool = True, verbose: bool = False):
         self.project_root = Path(project_root)
+        self.verbose = verbose
+        self.cache_file = self.project_root / CACHE_FILE_NAME if use_cache else None
         self.rtl_files = []
         self.modules = {}
         self.errors = []
@@ -33,11 +129,17 @@ class RTLVerifier:
         
     def find_rtl_files(self) -> List[Path]:
         """查找所有RTL文件"""
-        rtl_patterns = ['**/*.v', '**/*.sv', '**/*.vh']
-        files = []
+        # 单次目录遍历，按扩展名分组；拼接顺序与逐个模式glob的结果一致
+        files_by_ext = {'v': [], 'sv': [], 'vh': []}
+        
+        for root, _, filenames in os.walk(self.project_root):
+            root_path = Path(root)
+            for filename in filenames:
+                _, dot, ext = filename.rpartition('.')
+                if dot and ext in files_by_ext:
+                    files_by_ext[ext].append(root_path / filename)
         
-        for pattern in rtl_patterns:
-            files.extend(self.project_root.glob(pattern))
+        files = files_by_ext['v'] + files_by_ext['sv'] + files_by_ext['vh']
             
         # 过滤掉测试平台文件
         rtl_files = [f for f in files if 'testbench' not in str(f) and 'tb_' not in f.name]
@@ -45,65 +147,10 @@ class RTLVerifier:
         self.rtl_files = rtl_files
         return rtl_files
     
-    def parse_module(self, file_path: Path) -> Dict:
+    def parse_module(self, file_path: Path) -> ModuleInfo:
         """解析Verilog模块"""
-        try:
-            with open(file_path, 'r', encoding='utf-8') as f:
-                content = f.read()
-        except UnicodeDecodeError:
-            try:
-                with open(file_path, 'r', encoding='gb2312') as f:
-                    content = f.read()
-            except:
-                self.errors.append(f"无法读取文件: {file_path}")
-                return {}
-        
-        module_info = {
-            'name': '',
-            'file': str(file_path),
-            'inputs': [],
-            'outputs': [],
-            'inouts': [],
-            'parameters': [],
-            'line_count': len(content.splitlines()),
-            'has_timescale': False,
-            'has_clk': False,
-            'has_rst': False
-        }
-        
-        # 检查时间尺度
-        if '`timescale' in content:
-            module_info['has_timescale'] = True
-        
-        # 查找模块声明
-        module_match = re.search(r'module\s+(\w+)\s*\(', content, re.IGNORECASE)
-        if module_match:
-            module_info['name'] = module_match.group(1)
-        else:
-            self.errors.append(f"在文件 {file_path} 中未找到模块声明")
-            return module_info
-        
-        # 解析端口声明
-        port_patterns = [
-            (r'input\s+(?:\[[\d:]+\])?\s*(\w+)', 'inputs'),
-            (r'output\s+(?:\[[\d:]+\])?\s*(\w+)', 'outputs'),
-            (r'inout\s+(?:\[[\d:]+\])?\s*(\w+)', 'inouts')
-        ]
-        
-        for pattern, port_type in port_patterns:
-            matches = re.findall(pattern, content, re.IGNORECASE)
-            module_info[port_type].extend(matches)
-        
-        # 检查时钟和复位信号
-        if any('clk' in port.lower() for port in module_info['inputs']):
-            module_info['has_clk'] = True
-        if any('rst' in port.lower() for port in module_info['inputs']):
-            module_info['has_rst'] = True
-        
-        # 查找参数
-        param_matches = re.findall(r'parameter\s+(\w+)', content, re.IGNORECASE)
-        module_info['parameters'].extend(param_matches)
-        
+        module_info, errors = _parse_module_file(file_path)
+        self.errors.extend(errors)
         return module_info
     
     def check_connectivity(self) -> List[str]:
@@ -111,7 +158,7 @@ class RTLVerifier:
         issues = []
         
         # 查找顶层模块
-        top_modules = [m for m in self.modules.values() if 'top' in m['name'].lower()]
+        top_modules = [m for m in self.modules.values() if 'top' in m.name.lower()]
         
         if not top_modules:
             issues.append("未找到顶层模块")
@@ -119,11 +166,10 @@ class RTLVerifier:
         
         top_module = top_modules[0]
         
-        # 检查基本信号
+        # 检查基本信号（复用解析时生成的小写端口名串；信号名不含'|'，不会跨端口误匹配）
         required_signals = ['clk', 'rst_n', 'enable']
         for signal in required_signals:
-            found = any(signal in port.lower() for port in top_module['inputs'])
-            if not found:
+            if signal not in top_module.inputs_lc:
                 issues.append(f"顶层模块缺少必需信号: {signal}")
         
         return issues
@@ -134,32 +180,40 @@ class RTLVerifier:
         
         for module in self.modules.values():
             # 检查时间尺度
-            if not module['has_timescale']:
-                issues.append(f"模块 {module['name']} 缺少 timescale 指令")
+            if not module.has_timescale:
+                issues.append(f"模块 {module.name} 缺少 timescale 指令")
             
             # 检查时钟和复位
-            if module['line_count'] > 50:  # 只检查大型模块
-                if not module['has_clk']:
-                    issues.append(f"模块 {module['name']} 可能缺少时钟信号")
-                if not module['has_rst']:
-                    issues.append(f"模块 {module['name']} 可能缺少复位信号")
+            if module.line_count > 50:  # 只检查大型模块
+                if not module.has_clk:
+                    issues.append(f"模块 {module.name} 可能缺少时钟信号")
+                if not module.has_rst:
+                    issues.append(f"模块 {module.name} 可能缺少复位信号")
         
         return issues
     
     def analyze_complexity(self) -> Dict:
         """分析代码复杂度"""
-        total_lines = sum(m['line_count'] for m in self.modules.values())
-        total_modules = len(self.modules)
+        # 行数单独取成列表，sum/max/index都在C层完成（并列时index取先出现的）
+        modules = list(self.modules.values())
+        line_counts = [m.line_count for m in modules]
+        total_lines = sum(line_counts)
+        total_modules = len(modules)
         avg_lines_per_module = total_lines / max(total_modules, 1)
         
-        largest_module = max(self.modules.values(), key=lambda x: x['line_count'], default={})
+        if line_counts:
+            largest_lines = max(line_counts)
+            largest_name = modules[line_counts.index(largest_lines)].name
+        else:
+            largest_lines = 0
+            largest_name = 'N/A'
         
         return {
             'total_lines': total_lines,
             'total_modules': total_modules,
             'avg_lines_per_module': int(avg_lines_per_module),
-            'largest_module': largest_module.get('name', 'N/A'),
-            'largest_module_lines': largest_module.get('line_count', 0)
+            'largest_module': largest_name,
+            'largest_module_lines': largest_lines
         }
     
     def run_verification(self) -> Dict:
@@ -170,12 +224,52 @@ class RTLVerifier:
         rtl_files = self.find_rtl_files()
         print(f"📁 找到 {len(rtl_files)} 个RTL文件")
         
-        # 2. 解析模块
+        # 2. 解析模块（未修改的文件直接复用缓存结果；各文件相互独立，文件多时分发到多个进程）
+        cache = _load_parse_cache(self.cache_file) if self.cache_file else {}
+        new_cache = {}
+        results = {}
+        stamps = {}
+        stale_files = []
+        
         for file_path in rtl_files:
-            print(f"📄 解析模块: {file_path.name}")
-            module_info = self.parse_module(file_path)
-            if module_info.get('name'):
-                self.modules[module_info['name']] = module_info
+            key = str(file_path)
+            try:
+                st = os.stat(file_path)
+            except OSError:
+                stale_files.append(file_path)
+                continue
+            
+            stamps[key] = [st.st_mtime_ns, st.st_size]
+            entry = cache.get(key)
+            if entry and entry['stamp'] == stamps[key]:
+                results[key] = ModuleInfo(*entry['module_info']), entry['errors']
+                new_cache[key] = entry
+            else:
+                stale_files.append(file_path)
+        
+        if len(stale_files) >= _PARALLEL_MIN_FILES:
+            with ProcessPoolExecutor() as executor:
+                fresh = list(executor.map(_parse_module_file, stale_files, chunksize=8))
+        else:
+            fresh = map(_parse_module_file, stale_files)
+        
+        for file_path, (module_info, errors) in zip(stale_files, fresh):
+            key = str(file_path)
+            results[key] = module_info, errors
+            if key in stamps:
+                new_cache[key] = {'stamp': stamps[key], 'module_info': module_info, 'errors': errors}
+        
+        # 按文件顺序合并各文件的解析结果
+        for file_path in rtl_files:
+            if self.verbose:
+                print(f"📄 解析模块: {file_path.name}")
+            module_info, errors = results[str(file_path)]
+            self.errors.extend(errors)
+            if module_info.name:
+                self.modules[module_info.name] = module_info
+        
+        if self.cache_file:
+            _save_parse_cache(self.cache_file, new_cache)
         
         print(f"🔧 解析完成，共 {len(self.modules)} 个模块")
         
@@ -201,46 +295,47 @@ class RTLVerifier:
     
     def generate_report(self, results: Dict) -> str:
         """生成验证报告"""
-        report = []
-        report.append("=" * 60)
-        report.append("LC3plus编码器RTL验证报告")
-        report.append("=" * 60)
-        report.append("")
+        buf = io.StringIO()
+        w = buf.write
+        w("=" * 60 + "\n")
+        w("LC3plus编码器RTL验证报告\n")
+        w("=" * 60 + "\n")
+        w("\n")
         
         # 概述
-        report.append("📊 项目概述:")
-        report.append(f"  总模块数: {results['complexity']['total_modules']}")
-        report.append(f"  总代码行数: {results['complexity']['total_lines']}")
-        report.append(f"  平均模块大小: {results['complexity']['avg_lines_per_module']} 行")
-        report.append(f"  最大模块: {results['complexity']['largest_module']} ({results['complexity']['largest_module_lines']} 行)")
-        report.append("")
+        w("📊 项目概述:\n")
+        w(f"  总模块数: {results['complexity']['total_modules']}\n")
+        w(f"  总代码行数: {results['complexity']['total_lines']}\n")
+        w(f"  平均模块大小: {results['complexity']['avg_lines_per_module']} 行\n")
+        w(f"  最大模块: {results['complexity']['largest_module']} ({results['complexity']['largest_module_lines']} 行)\n")
+        w("\n")
         
         # 模块列表
-        report.append("🔧 模块列表:")
+        w("🔧 模块列表:\n")
         for name, info in results['modules'].items():
-            report.append(f"  {name}:")
-            report.append(f"    文件: {Path(info['file']).name}")
-            report.append(f"    行数: {info['line_count']}")
-            report.append(f"    输入端口: {len(info['inputs'])}")
-            report.append(f"    输出端口: {len(info['outputs'])}")
-            report.append(f"    时间尺度: {'✓' if info['has_timescale'] else '✗'}")
-        report.append("")
+            w(f"  {name}:\n")
+            w(f"    文件: {info.file_basename}\n")
+            w(f"    行数: {info.line_count}\n")
+            w(f"    输入端口: {len(info.inputs)}\n")
+            w(f"    输出端口: {len(info.outputs)}\n")
+            w(f"    时间尺度: {'✓' if info.has_timescale else '✗'}\n")
+        w("\n")
         
         # 错误和警告
         if results['errors']:
-            report.append("❌ 错误:")
+            w("❌ 错误:\n")
             for error in results['errors']:
-                report.append(f"  - {error}")
-            report.append("")
+                w(f"  - {error}\n")
+            w("\n")
         
         if results['warnings']:
-            report.append("⚠️ 警告:")
+            w("⚠️ 警告:\n")
             for warning in results['warnings']:
-                report.append(f"  - {warning}")
-            report.append("")
+                w(f"  - {warning}\n")
+            w("\n")
         
         # 质量评估
-        report.append("📈 代码质量评估:")
+        w("📈 代码质量评估:\n")
         error_count = len(results['errors'])
         warning_count = len(results['warnings'])
         
@@ -257,34 +352,38 @@ class RTLVerifier:
             quality = "需要改进"
             score = "C"
         
-        report.append(f"  整体质量: {quality} ({score})")
-        report.append(f"  错误数量: {error_count}")
-        report.append(f"  警告数量: {warning_count}")
-        report.append("")
+        w(f"  整体质量: {quality} ({score})\n")
+        w(f"  错误数量: {error_count}\n")
+        w(f"  警告数量: {warning_count}\n")
+        w("\n")
         
         # 建议
-        report.append("💡 改进建议:")
+        w("💡 改进建议:\n")
         if not results['errors'] and not results['warnings']:
-            report.append("  - 代码质量良好，可以进行硬件验证")
+            w("  - 代码质量良好，可以进行硬件验证\n")
         else:
-            report.append("  - 修复所有编译错误")
-            report.append("  - 添加缺失的时间尺度指令")
-            report.append("  - 检查模块端口连接")
-            report.append("  - 确保时钟和复位信号正确连接")
+            w("  - 修复所有编译错误\n")
+            w("  - 添加缺失的时间尺度指令\n")
+            w("  - 检查模块端口连接\n")
+            w("  - 确保时钟和复位信号正确连接\n")
         
-        report.append("")
-        report.append("=" * 60)
+        w("\n")
+        w("=" * 60)
         
-        return "\n".join(report)
+        return buf.getvalue()
 
 def main():
     """主函数"""
+    parser = argparse.ArgumentParser(description='LC3plus编码器RTL验证工具')
+    parser.add_argument('--verbose', action='store_true', help='逐个打印解析的RTL文件')
+    args = parser.parse_args()
+    
     project_root = "."
     
     print("🚀 LC3plus编码器RTL验证工具")
     print("=" * 40)
     
-    verifier = RTLVerifier(project_root)
+    verifier = RTLVerifier(project_root, verbose=args.verbose)
     results = verifier.run_verification()
     
     # 生成报告
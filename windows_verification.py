@@ -9,11 +9,110 @@ LC3plus编码器Windows验证脚本
 日期：2024-06-11
 """
 
+import codecs
+import hashlib
+import json
 import os
-import re
 import sys
 from pathlib import Path
 from datetime import datetime
+from functools import lru_cache
+
+import _rtl_patterns
+from _rtl_patterns import MODULE_RE, PORT_WORD_RE, TIMESCALE_TOKEN, iter_chunks, open_source
+
+# 解析结果缓存文件（位于项目根目录），按(mtime, size)判断文件是否修改
+CACHE_FILE_NAME = '.windows_verify_cache.json'
+
+def _cache_version():
+    """以脚本自身及共用正则模块的哈希作为缓存版本，解析逻辑修改后旧缓存自动失效"""
+    digest = hashlib.blake2b(Path(__file__).read_bytes(), digest_size=16)
+    digest.update(Path(_rtl_patterns.__file__).read_bytes())
+    return digest.hexdigest()
+
+def _load_parse_cache(cache_file):
+    """加载解析结果缓存，文件缺失、损坏或版本不符时返回空字典"""
+    try:
+        with open(cache_file, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    
+    if not isinstance(data, dict) or data.get('version') != _cache_version():
+        return {}
+    return data.get('entries', {})
+
+def _save_parse_cache(cache_file, entries):
+    """保存解析结果缓存"""
+    try:
+        with open(cache_file, 'w', encoding='utf-8') as f:
+            json.dump({'version': _cache_version(), 'entries': entries}, f, ensure_ascii=False)
+    except OSError as e:
+        print_warning(f"无法写入缓存文件 {cache_file} - {e}")
+
+# 超过该长度（字节数）的文件使用JIT编译的代码行统计
+JIT_LINES_THRESHOLD = 1 << 20
+
+def _count_code_lines_kernel(buf):
+    """逐字节统计代码行：每行第一个非空白字节不是'//'的开头即计为一行"""
+    count = 0
+    at_line_start = True
+    for i in range(buf.size):
+        c = buf[i]
+        if c == 10 or c == 13:  # '\n'、'\r'
+            at_line_start = True
+        elif at_line_start and c != 32 and c != 9 and c != 11 and c != 12:
+            at_line_start = False
+            if not (c == 47 and i + 1 < buf.size and buf[i + 1] == 47):  # '//'
+                count += 1
+    return count
+
+@lru_cache(maxsize=None)
+def _jit_count_code_lines():
+    """首次遇到大文件时才导入Numba（可选依赖）并编译统计函数，不可用时返回None"""
+    try:
+        from numba import njit
+    except ImportError:
+        return None
+    return njit(cache=True)(_count_code_lines_kernel)
+
+def _check_utf8(content):
+    """非ASCII内容必须是合法的UTF-8，否则抛出UnicodeDecodeError"""
+    if isinstance(content, bytes):
+        if not content.isascii():
+            content.decode('utf-8')
+        return
+    
+    # mmap逐块增量校验；出错时对完整内容重新解码，保证异常信息中的位置与整体解码一致
+    decoder = codecs.getincrementaldecoder('utf-8')()
+    try:
+        for chunk in iter_chunks(content):
+            decoder.decode(chunk)
+        decoder.decode(b'', final=True)
+    except UnicodeDecodeError:
+        bytes(content).decode('utf-8')
+        raise
+
+def _count_code_lines(content):
+    """统计非空且不以//开头的行数，行按LF、CR、CRLF切分（与bytes.splitlines一致）"""
+    count_lines = _jit_count_code_lines() if len(content) >= JIT_LINES_THRESHOLD else None
+    if count_lines is None:
+        return sum(1 for line in bytes(content).splitlines()
+                   if (stripped := line.strip()) and not stripped.startswith(b'//'))
+    
+    import numpy as np
+    buf = np.frombuffer(content, dtype=np.uint8)
+    code_lines = int(count_lines(buf))
+    # 释放对mmap缓冲区的引用，保证mmap可以正常关闭
+    del buf
+    return code_lines
+
+def _list_dir(dir_path):
+    """一次列出目录下的文件名，目录不存在时返回空集合"""
+    try:
+        return set(os.listdir(dir_path))
+    except OSError:
+        return set()
 
 def print_header(title):
     """打印带颜色的标题"""
@@ -40,8 +139,9 @@ def print_info(msg):
 class RTLVerifier:
     """RTL代码验证器"""
     
-    def __init__(self, project_root):
+    def __init__(self, project_root, use_cache=True):
         self.project_root = Path(project_root)
+        self.cache_file = self.project_root / CACHE_FILE_NAME if use_cache else None
         self.rtl_dir = self.project_root / "rtl"
         self.sim_dir = self.project_root / "sim"
         self.errors = []
@@ -50,37 +150,40 @@ class RTLVerifier:
         
     def find_rtl_files(self):
         """查找所有RTL文件"""
+        # 单次目录遍历同时匹配两种扩展名
         rtl_files = []
-        for pattern in ["**/*.v", "**/*.sv"]:
-            rtl_files.extend(self.rtl_dir.glob(pattern))
+        for root, _, filenames in os.walk(self.rtl_dir):
+            root_path = Path(root)
+            for filename in filenames:
+                if filename.endswith((".v", ".sv")):
+                    rtl_files.append(root_path / filename)
         return sorted(rtl_files)
     
     def parse_module(self, file_path):
         """解析Verilog模块"""
         try:
-            with open(file_path, 'r', encoding='utf-8') as f:
-                content = f.read()
-            
-            # 查找模块声明
-            module_pattern = r'module\s+(\w+)'
-            module_match = re.search(module_pattern, content)
-            
-            if not module_match:
-                return None
+            with open_source(file_path) as content:
+                # 非ASCII内容仍需是合法的UTF-8
+                _check_utf8(content)
                 
-            module_name = module_match.group(1)
-            
-            # 统计代码行数
-            lines = content.split('\n')
-            non_empty_lines = [line for line in lines if line.strip() and not line.strip().startswith('//')]
-            code_lines = len(non_empty_lines)
-            
-            # 检查时间尺度
-            has_timescale = '`timescale' in content
-            
-            # 统计端口
-            input_ports = len(re.findall(r'\binput\b', content))
-            output_ports = len(re.findall(r'\boutput\b', content))
+                # 查找模块声明
+                module_match = MODULE_RE.search(content)
+                
+                if not module_match:
+                    return None
+                    
+                module_name = module_match.group(1).decode('ascii')
+                
+                # 统计代码行数
+                code_lines = _count_code_lines(content)
+                
+                # 检查时间尺度（mmap的in只比较单个字节，统一用find）
+                has_timescale = content.find(TIMESCALE_TOKEN) != -1
+                
+                # 统计端口（一次扫描同时匹配input和output）
+                port_words = PORT_WORD_RE.findall(content)
+                input_ports = port_words.count(b'input')
+                output_ports = len(port_words) - input_ports
             
             return {
                 'name': module_name,
@@ -126,9 +229,10 @@ class RTLVerifier:
         
         processing_dir = self.rtl_dir / "processing"
         
+        present = _list_dir(processing_dir)
+        
         for filename, description in required_modules.items():
-            file_path = processing_dir / filename
-            if file_path.exists():
+            if filename in present:
                 print_success(f"{description}: {filename}")
             else:
                 self.errors.append(f"缺少{description}: {filename}")
@@ -145,9 +249,10 @@ class RTLVerifier:
         
         memory_dir = self.rtl_dir / "memory"
         
+        present = _list_dir(memory_dir)
+        
         for filename, description in memory_modules.items():
-            file_path = memory_dir / filename
-            if file_path.exists():
+            if filename in present:
                 print_success(f"{description}: {filename}")
             else:
                 self.warnings.append(f"缺少{description}: {filename}")
@@ -171,8 +276,31 @@ class RTLVerifier:
         total_lines = 0
         modules_with_timescale = 0
         
+        # 未修改的文件直接复用缓存的解析结果
+        cache = _load_parse_cache(self.cache_file) if self.cache_file else {}
+        new_cache = {}
+        
         for file_path in rtl_files:
-            module_info = self.parse_module(file_path)
+            key = str(file_path)
+            try:
+                st = os.stat(file_path)
+                stamp = [st.st_mtime_ns, st.st_size]
+            except OSError:
+                stamp = None
+            
+            entry = cache.get(key)
+            if stamp and entry and entry['stamp'] == stamp:
+                module_info = entry['module_info']
+            else:
+                error_count = len(self.errors)
+                module_info = self.parse_module(file_path)
+                # 解析出错（可能是权限等暂时性问题）时不写缓存，下次重新解析
+                if len(self.errors) > error_count:
+                    stamp = None
+            
+            if stamp:
+                new_cache[key] = {'stamp': stamp, 'module_info': module_info}
+            
             if module_info:
                 self.modules[module_info['name']] = module_info
                 total_lines += module_info['lines']
@@ -182,6 +310,9 @@ class RTLVerifier:
                 else:
                     self.warnings.append(f"模块 {module_info['name']} 缺少时间尺度声明")
         
+        if self.cache_file:
+            _save_parse_cache(self.cache_file, new_cache)
+        
         print_success(f"找到 {len(self.modules)} 个模块")
         print_success(f"总代码行数: {total_lines}")
         print_success(f"平均模块大小: {total_lines // len(self.modules) if self.modules else 0} 行")
@@ -227,9 +358,12 @@ class RTLVerifier:
         else:
             grade = "C (需要改进)"
         
+        # 总代码行数只统计一次，屏幕输出和报告文件共用
+        total_lines = sum(m['lines'] for m in self.modules.values())
+        
         print(f"\n📊 项目统计:")
         print(f"  总模块数: {len(self.modules)}")
-        print(f"  总代码行数: {sum(m['lines'] for m in self.modules.values())}")
+        print(f"  总代码行数: {total_lines}")
         print(f"  错误数量: {len(self.errors)}")
         print(f"  警告数量: {len(self.warnings)}")
         print(f"\n📈 代码质量: {grade}")
@@ -255,7 +389,7 @@ class RTLVerifier:
             
             f.write(f"项目统计:\n")
             f.write(f"  总模块数: {len(self.modules)}\n")
-            f.write(f"  总代码行数: {sum(m['lines'] for m in self.modules.values())}\n")
+            f.write(f"  总代码行数: {total_lines}\n")
             f.write(f"  错误数量: {len(self.errors)}\n")
             f.write(f"  警告数量: {len(self.warnings)}\n\n")
             